@@ -105,8 +105,10 @@ class BuildManager:
 
         # 3. Build
         yield ">>> Starting build...\n"
+        # Profiles share the Klipper tree (.config, out/), so they can't be built side
+        # by side; parallelize within each build instead to use every core.
         process: Process = await asyncio.create_subprocess_exec(
-            "make",
+            "make", f"-j{os.cpu_count() or 1}",
             cwd=self.klipper_dir,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT
@@ -1,10 +1,128 @@
 import os
+import re
+import json
+import socket
+import struct
 import asyncio
-import glob
 import httpx
-from typing import List, Dict, AsyncGenerator, Optional, Any, Set
+from typing import List, Dict, AsyncGenerator, Optional, Any, Set, Tuple, Callable, Awaitable, Hashable, Iterable
 from asyncio.subprocess import Process
 
+try:
+    import termios
+except ImportError:
+    # Not available on Windows; _send_magic_baud falls back to pyserial there
+    termios = None
+
+try:
+    import pyudev
+except ImportError:
+    # Optional: lets bootloader waits wake on USB/tty hotplug instead of only polling
+    pyudev = None
+
+# (name prefix, requires a digit right after the prefix) for /dev serial candidates.
+_SERIAL_CANDIDATE_PREFIXES: Tuple[Tuple[str, bool], ...] = (
+    ("ttyACM", False),
+    ("ttyUSB", False),
+    ("serial", True),
+    ("ttyAMA", True),
+    ("ttyS", True),
+)
+
+# Matches a lowercase 12-hex-digit CAN UUID (identifiers are lowercased upstream).
+_is_can_uuid = re.compile(r"[0-9a-f]{12}").fullmatch
+_BOOTLOADER_ID_RE = re.compile(r"katapult|canboot", re.IGNORECASE)
+
+def is_bootloader_id(device_id: str) -> bool:
+    """True if a serial id names a Katapult/CanBoot bootloader (any case)."""
+    return _BOOTLOADER_ID_RE.search(device_id) is not None
+
+# A dfu-util -l device line, e.g.:
+# Found DFU: [0483:df11] ver=0200, devnum=12, cfg=1, intf=0, path="1-1.2", alt=0, name="@Internal Flash  /0x08000000/064*0002Kg", serial="357236543131"
+_DFU_FOUND_RE = re.compile(r"Found DFU: \[([^\]]*)\]")
+# The key="value" fields of that line (path, name, serial)
+_DFU_FIELD_RE = re.compile(r'(\w+)="([^"]*)"')
+
+# udev's netlink multicast group: events re-broadcast after udev has run its rules, so
+# /dev/serial/by-id links already exist. Used for hotplug wakeups when pyudev is missing.
+_NETLINK_KOBJECT_UEVENT = 15
+_UDEV_MONITOR_GROUP = 2
+_HOTPLUG_SUBSYSTEMS: Tuple[bytes, ...] = (b"usb", b"tty")
+
+def _open_uevent_socket() -> socket.socket:
+    """Opens a non-blocking socket subscribed to udev's netlink events (Linux only)."""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, _NETLINK_KOBJECT_UEVENT)
+    try:
+        sock.bind((0, _UDEV_MONITOR_GROUP))
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def _uevent_subsystem(message: bytes) -> bytes:
+    """Returns the SUBSYSTEM of a udev (or raw kernel) uevent message, b"" if absent."""
+    if message.startswith(b"libudev\0"):
+        # udev_monitor_netlink_header: prefix[8], magic, header_size, properties_off, ...
+        message = message[struct.unpack_from("=I", message, 16)[0]:]
+    for field in message.split(b"\0"):
+        if field.startswith(b"SUBSYSTEM="):
+            return field[10:]
+    return b""
+
+def diff_device_ids(before: Iterable[str], after: Iterable[str]) -> Tuple[List[str], Set[str]]:
+    """Compares two device id snapshots, e.g. from before and after a reboot.
+
+    Returns the ids that appeared (in the order of after) and the set of ids that went away.
+    """
+    before_ids: Set[str] = set(before)
+    after_ids: List[str] = list(after)
+    return [i for i in after_ids if i not in before_ids], before_ids.difference(after_ids)
+
+def _serial_mode(dev: str, is_configured: bool) -> str:
+    """Guesses a serial device's mode from its path and Klipper configuration."""
+    # "klipper"/"kalico" in the name means firmware mode (service),
+    # "katapult"/"canboot" means bootloader mode (ready).
+    dev_lower: str = dev.lower()
+    if "klipper" in dev_lower or "kalico" in dev_lower:
+        return "service"
+    if "katapult" in dev_lower or "canboot" in dev_lower:
+        return "ready"
+    return "service" if is_configured else "ready"
+
+def _send_magic_baud(device_id: str) -> None:
+    """Opens a serial port at 1200 baud and closes it again, which asks a bootloader-aware
+    firmware to reboot. Only the line-coding change and the DTR drop on close matter,
+    so plain termios calls are enough."""
+    if termios is None:
+        import serial
+        serial.Serial(device_id, 1200).close()
+        return
+    fd: int = os.open(device_id, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        attrs = termios.tcgetattr(fd)
+        attrs[2] |= termios.HUPCL # Drop DTR on close
+        attrs[4] = attrs[5] = termios.B1200
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    finally:
+        os.close(fd)
+
+def crc16_ccitt(buf: bytes) -> int:
+    """Katapult's CRC16-CCITT (same bitwise loop as Katapult's flashtool)."""
+    crc: int = 0xFFFF
+    for data in buf:
+        data ^= crc & 0xFF
+        data ^= (data & 0x0F) << 4
+        crc = ((data << 8) | (crc >> 8)) ^ (data >> 4) ^ (data << 3)
+    return crc & 0xFFFF
+
+def build_katapult_packet(cmd_body: bytes) -> bytes:
+    """Frames a Katapult command: header, body, CRC16 (little endian), trailer."""
+    return b"\x01\x88" + cmd_body + crc16_ccitt(cmd_body).to_bytes(2, "little") + b"\x99\x03"
+
+# The COMPLETE (jump to application) packet never changes, so frame it once at import.
+_KATAPULT_COMPLETE_PKT_HEX: str = build_katapult_packet(b"\x15\x00").hex()
+
 class FlashManager:
     def __init__(self, klipper_dir: str, katapult_dir: str) -> None:
         self.klipper_dir: str = klipper_dir
@@ -17,29 +135,235 @@ class FlashManager:
         self._dfu_cache_time: float = 0.0
         self._dfu_cache_ttl_s: float = 1.0
 
+        # Serial discovery results keyed by skip_moonraker -> (time, devices)
+        self._serial_cache: Dict[bool, Tuple[float, List[Dict[str, str]]]] = {}
+        self._serial_cache_ttl_s: float = 1.0
+        # While a udev monitor runs, scans that only depend on USB/tty devices (DFU, and
+        # serial without Moonraker) stay valid until a hotplug event drops them; the TTL
+        # is only a safety net then.
+        self._hotplug_cache_ttl_s: float = 30.0
+        # Bumped by invalidate_discovery_cache, so a scan that was already running when a
+        # device came or went isn't cached
+        self._usb_generation: int = 0
+
         # CAN operations (discovery, flashing) must be mutexed to prevent bus contention.
         # High-bandwidth flashing can fail if background discovery queries are running.
         self._can_lock: asyncio.Lock = asyncio.Lock()
         self._can_cache: Dict[str, List[Dict[str, str]]] = {}
         self._can_cache_time: Dict[str, float] = {}
         self._can_cache_ttl_s: float = 2.0 # Short TTL to keep status feeling "live"
+        # Interfaces recently seen "state UP", so ensure_canbus_up can skip the ip spawn.
+        self._can_iface_up_until: Dict[str, float] = {}
+        self._can_iface_up_ttl_s: float = 10.0
+        # Last is_interface_up() result per interface -> (time, up); fleet status
+        # polls ask once per bridge device, so share one `ip` spawn between them.
+        self._iface_status_cache: Dict[str, Tuple[float, bool]] = {}
+        self._iface_status_ttl_s: float = 1.5
+
+        # When Moonraker is unreachable every query would wait for the full timeout;
+        # remember the failure briefly so discovery refreshes skip it.
+        self._moonraker_down_until: float = 0.0
+        self._moonraker_down_ttl_s: float = 30.0
+        # Last MCU list from Moonraker -> (time, mcus); fleet polls check every
+        # bridge and CAN device against it, so one query serves a whole poll.
+        self._moonraker_mcus_cache: Optional[Tuple[float, Dict[str, Dict[str, str]]]] = None
+        self._moonraker_mcus_ttl_s: float = 1.5
+
+        # Persistent flashtool.py process for short CAN queries/reboots, so each
+        # one doesn't pay interpreter startup and imports.
+        self._flashtool_worker: Optional[Process] = None
+        self._flashtool_worker_lock: asyncio.Lock = asyncio.Lock()
+
+        # Short status probes (ip, dfu-util -l) allowed to run at once; fleet polls and
+        # batch readiness checks can otherwise start a burst of them on a small SBC.
+        self._probe_slots: asyncio.Semaphore = asyncio.Semaphore(min(4, os.cpu_count() or 1))
+
+        # In-flight discovery calls, so concurrent callers share one scan (single-flight).
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+        # udev monitor for USB/tty hotplug (pyudev, else a raw netlink socket), started on
+        # first wait_for_usb_change. None until started, False if neither can be opened.
+        self._udev_observer: Any = None
+        self._usb_changed: asyncio.Event = asyncio.Event()
+
+    async def _single_flight(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs factory() once for all concurrent callers using the same key."""
+        task: Optional["asyncio.Future[Any]"] = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller being cancelled doesn't cancel the scan for the others.
+        return await asyncio.shield(task)
+
+    def invalidate_discovery_cache(self) -> None:
+        """Drops the cached serial and DFU scans so the next discover call rescans."""
+        self._usb_generation += 1
+        self._serial_cache.clear()
+        self._dfu_cache_time = 0.0
+
+    def _usb_scan_ttl(self, default: float) -> float:
+        """Cache lifetime for a scan that only depends on the USB/tty devices present."""
+        if self._udev_observer is None or self._udev_observer is False:
+            return default
+        return self._hotplug_cache_ttl_s
+
+    def _on_usb_change(self) -> None:
+        """A USB or tty device came or went: drop cached scans and wake waiters."""
+        self.invalidate_discovery_cache()
+        self._usb_changed.set()
+
+    def _on_uevent(self, sock: socket.socket) -> None:
+        """Drains the netlink socket; signals a change if a USB/tty event was among them."""
+        changed: bool = False
+        while True:
+            try:
+                message: bytes = sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # ENOBUFS: events were dropped, so assume one of them mattered
+                changed = True
+                break
+            if _uevent_subsystem(message) in _HOTPLUG_SUBSYSTEMS:
+                changed = True
+        if changed:
+            self._on_usb_change()
+
+    def _start_udev_monitor(self) -> bool:
+        """Starts the hotplug monitor once; returns whether it is running."""
+        if self._udev_observer is None:
+            self._udev_observer = False
+            loop = asyncio.get_event_loop()
+            if pyudev is not None:
+                try:
+                    monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+                    monitor.filter_by("usb")
+                    monitor.filter_by("tty")
+                    observer = pyudev.MonitorObserver(monitor, callback=lambda device: loop.call_soon_threadsafe(self._on_usb_change))
+                    observer.start()
+                    self._udev_observer = observer
+                except Exception as e:
+                    print(f"pyudev monitor unavailable: {e}")
+            if self._udev_observer is False:
+                # No thread needed: the socket is watched by the event loop itself
+                sock: Optional[socket.socket] = None
+                try:
+                    sock = _open_uevent_socket()
+                    loop.add_reader(sock.fileno(), self._on_uevent, sock)
+                    self._udev_observer = sock
+                except Exception as e:
+                    if sock is not None:
+                        sock.close()
+                    print(f"udev monitor unavailable, falling back to polling: {e}")
+        return self._udev_observer is not False
+
+    async def wait_for_usb_change(self, timeout: float) -> None:
+        """Sleeps up to timeout seconds, returning early if a USB or tty device is
+        added or removed in the meantime (plain sleep without a udev monitor)."""
+        if not self._start_udev_monitor():
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(self._usb_changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._usb_changed.clear()
+
+    async def send_magic_baud(self, device_id: str) -> None:
+        """Sends the 1200bps magic baud to a serial device (in the default executor)."""
+        await asyncio.get_event_loop().run_in_executor(None, _send_magic_baud, device_id)
+        # The device is about to drop off the bus and re-enumerate.
+        self.invalidate_discovery_cache()
+
+    async def _run_probe(self, *cmd: str) -> bytes:
+        """Runs a short status command under _probe_slots and returns its stdout."""
+        async with self._probe_slots:
+            process: Process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            stdout, _ = await process.communicate()
+            return stdout
+
+    async def _stop_flashtool_worker(self) -> None:
+        worker: Optional[Process] = self._flashtool_worker
+        self._flashtool_worker = None
+        if worker is not None and worker.returncode is None:
+            try:
+                worker.kill()
+                await worker.wait()
+            except ProcessLookupError:
+                pass
+
+    async def _run_flashtool(self, args: List[str], timeout: Optional[float] = None) -> Tuple[int, str]:
+        """Runs a short flashtool.py command, via the persistent worker when it is usable."""
+        flashtool: str = os.path.join(self.katapult_dir, "scripts", "flashtool.py")
+        async with self._flashtool_worker_lock:
+            try:
+                worker: Optional[Process] = self._flashtool_worker
+                if worker is None or worker.returncode is not None:
+                    worker = await asyncio.create_subprocess_exec(
+                        "python3", os.path.join(os.path.dirname(os.path.abspath(__file__)), "flashtool_worker.py"), flashtool,
+                        stdin=asyncio.subprocess.PIPE,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.DEVNULL
+                    )
+                    self._flashtool_worker = worker
+                assert worker.stdin is not None and worker.stdout is not None
+                worker.stdin.write(json.dumps({"args": args}).encode() + b"\n")
+                await worker.stdin.drain()
+                line: bytes = await asyncio.wait_for(worker.stdout.readline(), timeout=timeout)
+                if line:
+                    result: Dict[str, Any] = json.loads(line)
+                    return int(result["returncode"]), str(result["output"])
+                print("flashtool worker exited, falling back to a one-shot process")
+            except asyncio.TimeoutError:
+                # The worker is stuck mid-command; it can't be reused.
+                await self._stop_flashtool_worker()
+                raise
+            except Exception as e:
+                print(f"flashtool worker error, falling back to a one-shot process: {e}")
+            await self._stop_flashtool_worker()
+
+        process: Process = await asyncio.create_subprocess_exec(
+            "python3", flashtool, *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            raise
+        return process.returncode if process.returncode is not None else -1, stdout.decode()
 
     async def discover_serial_devices(self, skip_moonraker: bool = False) -> List[Dict[str, str]]:
         """Lists all serial devices in /dev/serial/by-id/ and common UART ports."""
+        now: float = asyncio.get_event_loop().time()
+        cached = self._serial_cache.get(skip_moonraker)
+        # Moonraker's view of the MCUs changes without any hotplug event
+        ttl: float = self._usb_scan_ttl(self._serial_cache_ttl_s) if skip_moonraker else self._serial_cache_ttl_s
+        if cached is None or (now - cached[0]) >= ttl:
+            generation: int = self._usb_generation
+            # Concurrent pollers (several UI tabs, status checks) share one scan
+            devices: List[Dict[str, str]] = await self._single_flight(
+                ("serial_devices", skip_moonraker),
+                lambda: self._discover_serial_devices(skip_moonraker)
+            )
+            cached = (asyncio.get_event_loop().time(), devices)
+            if generation == self._usb_generation:
+                self._serial_cache[skip_moonraker] = cached
+        # Callers annotate the returned dicts (e.g. 'managed'), so hand out copies
+        return [dict(d) for d in cached[1]]
+
+    async def _discover_serial_devices(self, skip_moonraker: bool) -> List[Dict[str, str]]:
         devices = []
         
         # 1. USB Serial devices (by-id is preferred for stability)
-        usb_devs: List[str] = glob.glob("/dev/serial/by-id/*")
-        
         # 2. Common UART and CDC-ACM devices
-        # Keep globs tight to avoid matching /dev/serial/ directories and by-id trees.
-        candidates: List[str] = (
-            glob.glob("/dev/ttyACM*")
-            + glob.glob("/dev/ttyUSB*")
-            + glob.glob("/dev/serial[0-9]*")
-            + glob.glob("/dev/ttyAMA[0-9]*")
-            + glob.glob("/dev/ttyS[0-9]*")
-        )
+        usb_devs, candidates = self._scan_serial_paths()
         
         moonraker_mcus: Dict[str, Dict[str, str]] = {}
         if not skip_moonraker:
@@ -62,87 +386,55 @@ class FlashManager:
                 configured_serial_ids.append(os.path.abspath(configured_id))
 
         # Combine and deduplicate while preserving order
-        all_candidates: List[str] = (
-            usb_devs
-            + [os.path.abspath(d) for d in candidates if os.path.exists(d)]
-            + configured_serial_ids
-        )
-        all_devs: List[str] = []
-        seen_ids: Set[str] = set()
-        for dev in all_candidates:
-            if dev in seen_ids:
-                continue
-            seen_ids.add(dev)
-            all_devs.append(dev)
+        all_devs: List[str] = list(dict.fromkeys(usb_devs + candidates + configured_serial_ids))
+        # Resolve each path once; every pass below keys off the real path.
+        real_paths: Dict[str, str] = {dev: os.path.realpath(dev) for dev in all_devs}
+
+        def configured_meta_for(dev: str) -> Optional[Dict[str, str]]:
+            return configured_lookup.get(dev) or configured_lookup.get(real_paths[dev])
+
+        # 1. by-id devices are almost certainly MCUs, always shown.
+        by_id_devs: List[str] = [d for d in all_devs if d.startswith("/dev/serial/by-id/")]
+        seen_real_paths: Set[str] = {real_paths[d] for d in by_id_devs}
+        for dev in by_id_devs:
+            meta = configured_meta_for(dev)
+            name: str = os.path.basename(dev)
+            if meta is not None:
+                name = f"{meta['name']} ({name})"
+            devices.append({"id": dev, "name": name, "type": "usb", "mode": _serial_mode(dev, meta is not None)})
 
-        seen_real_paths: Set[str] = set()
-        
+        # 2. ttyACM/ttyUSB devices, unless already represented by a by-id link
+        # (by-id entries are usually symlinks to ttyACM/USB).
         for dev in all_devs:
-            name: str = os.path.basename(dev)
-            real_path: str = os.path.realpath(dev)
-            configured_meta: Optional[Dict[str, str]] = configured_lookup.get(dev) or configured_lookup.get(real_path)
-            is_configured: bool = configured_meta is not None
-            
-            # If it's a by-id device, it's almost certainly an MCU
-            if dev.startswith("/dev/serial/by-id/"):
-                # If it has "klipper" or "kalico" in the name, it's in firmware mode (service)
-                # If it has "katapult" or "canboot", it's in bootloader mode (ready)
-                mode = "ready"
-                dev_lower = dev.lower()
-                if "klipper" in dev_lower or "kalico" in dev_lower:
-                    mode = "service"
-                elif "katapult" in dev_lower or "canboot" in dev_lower:
-                    mode = "ready"
-                elif is_configured:
-                    mode = "service"
-                
-                if is_configured:
-                    name = f"{configured_meta['name']} ({name})"
-                devices.append({"id": dev, "name": name, "type": "usb", "mode": mode})
-                seen_real_paths.add(real_path)
-            
-            # If it's a ttyACM/ttyUSB device, we show it if it's NOT already represented by a by-id link
-            # or if it's configured in Klipper.
-            elif dev.startswith("/dev/ttyACM") or dev.startswith("/dev/ttyUSB"):
-                # Check if this physical device is already in devices via by-id
-                # (This is a bit tricky, but usually by-id is a symlink to ttyACM/USB)
-                already_added = real_path in seen_real_paths
-                
-                if not already_added:
-                    # For generic tty devices, we rely on is_configured or name hints
-                    mode = "ready"
-                    dev_lower = dev.lower()
-                    if "klipper" in dev_lower or "kalico" in dev_lower:
-                        mode = "service"
-                    elif "katapult" in dev_lower or "canboot" in dev_lower:
-                        mode = "ready"
-                    elif is_configured:
-                        mode = "service"
-                    
-                    if is_configured:
-                        name = f"{configured_meta['name']} ({name})"
-                    devices.append({"id": dev, "name": name, "type": "usb", "mode": mode})
-                    seen_real_paths.add(real_path)
-
-            # Raw UART aliases/ports on SBCs (e.g. Raspberry Pi serial0/AMA/S ports)
-            # are only shown when explicitly configured in Klipper/Moonraker.
-            # This avoids duplicate/noise entries like ttyS0 when serial0 is the real MCU path.
-            elif (
-                dev.startswith("/dev/serial")
-                or dev.startswith("/dev/ttyAMA")
-                or dev.startswith("/dev/ttyS")
-            ):
-                if not is_configured:
-                    continue
-                if real_path in seen_real_paths:
-                    continue
-                mode = "service"
-                name = f"{configured_meta['name']} ({name})"
-                devices.append({"id": dev, "name": name, "type": "uart", "mode": mode})
-                seen_real_paths.add(real_path)
+            if not dev.startswith(("/dev/ttyACM", "/dev/ttyUSB")):
+                continue
+            real_path: str = real_paths[dev]
+            if real_path in seen_real_paths:
+                continue
+            meta = configured_meta_for(dev)
+            name = os.path.basename(dev)
+            if meta is not None:
+                name = f"{meta['name']} ({name})"
+            devices.append({"id": dev, "name": name, "type": "usb", "mode": _serial_mode(dev, meta is not None)})
+            seen_real_paths.add(real_path)
+
+        # 3. Raw UART aliases/ports on SBCs (e.g. Raspberry Pi serial0/AMA/S ports)
+        # are only shown when explicitly configured in Klipper/Moonraker.
+        # This avoids duplicate/noise entries like ttyS0 when serial0 is the real MCU path.
+        for dev in all_devs:
+            if dev.startswith("/dev/serial/by-id/") or not dev.startswith(("/dev/serial", "/dev/ttyAMA", "/dev/ttyS")):
+                continue
+            real_path = real_paths[dev]
+            if real_path in seen_real_paths:
+                continue
+            meta = configured_meta_for(dev)
+            if meta is None:
+                continue
+            devices.append({"id": dev, "name": f"{meta['name']} ({os.path.basename(dev)})", "type": "uart", "mode": "service"})
+            seen_real_paths.add(real_path)
 
         # Final fallback: always include configured /dev serial endpoints from Moonraker,
-        # even if they were not discovered by glob/exists checks above.
+        # even if they were not discovered by the /dev scan above.
         known_ids = {d["id"] for d in devices}
         for configured_id, meta in moonraker_mcus.items():
             if not isinstance(configured_id, str) or not configured_id.startswith("/dev/"):
@@ -159,72 +451,105 @@ class FlashManager:
                 
         return devices
 
+    def _scan_serial_paths(self) -> Tuple[List[str], List[str]]:
+        """Scans /dev once for by-id links and tty candidates.
+
+        Returns (by-id paths, tty/UART paths). Candidates are ordered ACM, USB,
+        serialN, AMA, S to match discovery priority. Dangling symlinks (e.g. a
+        stale /dev/serial0) are dropped; regular device nodes need no extra stat.
+        """
+        usb_devs: List[str] = []
+        if os.path.isdir("/dev/serial/by-id"):
+            with os.scandir("/dev/serial/by-id") as it:
+                usb_devs = [e.path for e in it if not e.name.startswith(".")]
+
+        # Keep matches tight to avoid matching /dev/serial/ directories and by-id trees.
+        buckets: List[List[str]] = [[] for _ in _SERIAL_CANDIDATE_PREFIXES]
+        try:
+            with os.scandir("/dev") as it:
+                for entry in it:
+                    name: str = entry.name
+                    for i, (prefix, needs_digit) in enumerate(_SERIAL_CANDIDATE_PREFIXES):
+                        if not name.startswith(prefix):
+                            continue
+                        if needs_digit and not name[len(prefix):len(prefix) + 1].isdigit():
+                            continue
+                        if entry.is_symlink() and not os.path.exists(entry.path):
+                            break
+                        buckets[i].append(entry.path)
+                        break
+        except OSError:
+            pass
+        return usb_devs, [path for bucket in buckets for path in bucket]
+
     async def discover_dfu_devices(self) -> List[Dict[str, str]]:
         """Lists all devices in DFU mode using dfu-util -l."""
         async with self._dfu_lock:
             now: float = asyncio.get_event_loop().time()
-            if (now - self._dfu_cache_time) < self._dfu_cache_ttl_s:
+            if (now - self._dfu_cache_time) < self._usb_scan_ttl(self._dfu_cache_ttl_s):
                 return list(self._dfu_cache)
+            return await self._scan_dfu_devices()
 
-            devices: List[Dict[str, str]] = []
-            try:
-                process: Process = await asyncio.create_subprocess_exec(
-                    "sudo", "dfu-util", "-l",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                stdout, _ = await process.communicate()
-                lines: List[str] = stdout.decode().splitlines()
-
-                # Example line: Found DFU: [0483:df11] ver=0200, devnum=12, cfg=1, intf=0, path="1-1.2", alt=0, name="@Internal Flash  /0x08000000/064*0002Kg", serial="357236543131"
-                for line in lines:
-                    if "Found DFU:" in line:
-                        # Extract VID:PID
-                        vid_pid: str = ""
-                        if "[" in line and "]" in line:
-                            vid_pid = line.split("[")[1].split("]")[0]
-
-                        # Extract serial
-                        serial: str = ""
-                        if 'serial="' in line:
-                            serial = line.split('serial="')[1].split('"')[0]
-
-                        # Extract path
-                        path: str = ""
-                        if 'path="' in line:
-                            path = line.split('path="')[1].split('"')[0]
-
-                        name: str = f"DFU Device ({vid_pid})"
-                        if serial:
-                            name += f" S/N: {serial}"
-
-                        # We use the serial or path as the ID for disambiguation.
-                        # If serial is "UNKNOWN" or empty, we MUST use the path.
-                        dev_id: str = serial if (serial and serial != "UNKNOWN") else path
-
-                        # Deduplicate: dfu-util -l lists multiple alt settings for the same device
-                        if any(d['id'] == dev_id for d in devices):
-                            continue
-
-                        devices.append({
-                            "id": dev_id,
-                            "name": name,
-                            "type": "dfu",
-                            "vid_pid": vid_pid,
-                            "path": path,
-                            "serial": serial,
-                            "mode": "ready"
-                        })
-            except Exception as e:
-                print(f"Error discovering DFU devices: {e}")
+    async def _scan_dfu_devices(self) -> List[Dict[str, str]]:
+        """Runs dfu-util -l and refreshes the DFU cache. The caller holds _dfu_lock."""
+        now: float = asyncio.get_event_loop().time()
+        generation: int = self._usb_generation
+        devices: List[Dict[str, str]] = []
+        try:
+            stdout = await self._run_probe("sudo", "dfu-util", "-l")
+            seen_ids: Set[str] = set()
+            for line in stdout.decode(errors="replace").splitlines():
+                found = _DFU_FOUND_RE.search(line)
+                if found:
+                    vid_pid: str = found.group(1)
+                    fields: Dict[str, str] = dict(_DFU_FIELD_RE.findall(line, found.end()))
+                    serial: str = fields.get("serial", "")
+                    path: str = fields.get("path", "")
+
+                    name: str = f"DFU Device ({vid_pid})"
+                    if serial:
+                        name += f" S/N: {serial}"
+
+                    # We use the serial or path as the ID for disambiguation.
+                    # If serial is "UNKNOWN" or empty, we MUST use the path.
+                    dev_id: str = serial if (serial and serial != "UNKNOWN") else path
+
+                    # Deduplicate: dfu-util -l lists multiple alt settings for the same device
+                    if dev_id in seen_ids:
+                        continue
+                    seen_ids.add(dev_id)
+
+                    devices.append({
+                        "id": dev_id,
+                        "name": name,
+                        "type": "dfu",
+                        "vid_pid": vid_pid,
+                        "path": path,
+                        "serial": serial,
+                        "mode": "ready"
+                    })
+        except Exception as e:
+            print(f"Error discovering DFU devices: {e}")
 
+        # A device that came or went during the scan may be missing from it
+        if generation == self._usb_generation:
             self._dfu_cache = list(devices)
             self._dfu_cache_time = now
-            return list(devices)
+        return list(devices)
 
     async def _get_moonraker_mcus(self) -> Dict[str, Dict[str, str]]:
-        """Queries Moonraker for configured MCUs and their current status."""
+        """Queries Moonraker for configured MCUs and their current status (cached briefly)."""
+        now: float = asyncio.get_event_loop().time()
+        cached = self._moonraker_mcus_cache
+        if cached is None or now - cached[0] >= self._moonraker_mcus_ttl_s:
+            mcus: Dict[str, Dict[str, str]] = await self._single_flight("moonraker_mcus", self._query_moonraker_mcus)
+            cached = self._moonraker_mcus_cache = (asyncio.get_event_loop().time(), mcus)
+        return dict(cached[1])
+
+    async def _query_moonraker_mcus(self) -> Dict[str, Dict[str, str]]:
         mcus = {}
+        if asyncio.get_event_loop().time() < self._moonraker_down_until:
+            return mcus
         try:
             async with httpx.AsyncClient() as client:
                 # 1. Query configfile to get all configured MCUs
@@ -300,6 +625,10 @@ class FlashManager:
                             "active": is_active,
                             "stats": stats
                         }
+            self._moonraker_down_until = 0.0
+        except httpx.TransportError as e:
+            print(f"Moonraker unreachable, skipping MCU queries for {self._moonraker_down_ttl_s:.0f}s: {e}")
+            self._moonraker_down_until = asyncio.get_event_loop().time() + self._moonraker_down_ttl_s
         except Exception as e:
             print(f"Error querying Moonraker: {e}")
         return mcus
@@ -393,6 +722,7 @@ class FlashManager:
 
     async def trigger_firmware_restart(self) -> None:
         """Sends a FIRMWARE_RESTART command to Klipper via Moonraker."""
+        self._moonraker_mcus_cache = None # MCU states change across the restart
         try:
             async with httpx.AsyncClient() as client:
                 await client.post("http://localhost:7125/printer/gcode/script?script=FIRMWARE_RESTART", timeout=2.0)
@@ -401,21 +731,21 @@ class FlashManager:
 
     async def ensure_canbus_up(self, interface: str = "can0", bitrate: int = 1000000) -> None:
         """Ensures the CAN interface is up."""
+        if asyncio.get_event_loop().time() < self._can_iface_up_until.get(interface, 0.0):
+            return
         try:
             # Check if up
-            process: Process = await asyncio.create_subprocess_exec(
-                "ip", "link", "show", interface,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, _ = await process.communicate()
+            stdout = await self._run_probe("ip", "link", "show", interface)
             if b"state UP" not in stdout:
                 print(f"Bringing up {interface}...")
-                process = await asyncio.create_subprocess_exec(
+                process: Process = await asyncio.create_subprocess_exec(
                     "sudo", "ip", "link", "set", interface, "up", "type", "can", "bitrate", str(bitrate)
                 )
                 await process.wait()
                 await asyncio.sleep(1)
+                self._iface_status_cache.pop(interface, None)
+            else:
+                self._can_iface_up_until[interface] = asyncio.get_event_loop().time() + self._can_iface_up_ttl_s
         except Exception as e:
             print(f"Error ensuring CAN up: {e}")
 
@@ -423,12 +753,7 @@ class FlashManager:
         """Lists all CAN interfaces present in the system."""
         try:
             can_interfaces: List[str] = []
-            process: Process = await asyncio.create_subprocess_exec(
-                "ip", "link", "show", "type", "can",
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, _ = await process.communicate()
+            stdout = await self._run_probe("ip", "link", "show", "type", "can")
             for line in stdout.decode().splitlines():
                 if ": " in line:
                     iface: str = line.split(":")[1].strip().split("@")[0]
@@ -440,6 +765,13 @@ class FlashManager:
 
     async def discover_can_devices(self, skip_moonraker: bool = False, force: bool = False) -> List[Dict[str, str]]:
         """List canbus devices present in the system, and collect all the devices on each bus"""
+        devices: List[Dict[str, str]] = await self._single_flight(
+            ("can_devices", skip_moonraker, force),
+            lambda: self._discover_can_devices(skip_moonraker=skip_moonraker, force=force)
+        )
+        return list(devices)
+
+    async def _discover_can_devices(self, skip_moonraker: bool, force: bool) -> List[Dict[str, str]]:
         try:
             # use the ip tool to get each can interface
             can_interfaces: List[str] = await self.list_can_interfaces()
@@ -475,7 +807,7 @@ class FlashManager:
                     process: Process = await asyncio.create_subprocess_exec(
                         klipper_python, os.path.join(self.klipper_dir, "scripts", "canbus_query.py"), interface,
                         stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
+                        stderr=asyncio.subprocess.DEVNULL
                     )
                     stdout, _ = await asyncio.wait_for(process.communicate(), timeout=2.0)
                     results = []
@@ -492,14 +824,8 @@ class FlashManager:
 
             async def run_katapult_query():
                 try:
-                    process: Process = await asyncio.create_subprocess_exec(
-                        "python3", os.path.join(self.katapult_dir, "scripts", "flashtool.py"), "-i", interface, "-q",
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-                    stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=5.0)
+                    _, output = await self._run_flashtool(["-i", interface, "-q"], timeout=5.0)
                     results = []
-                    output: str = stdout.decode()
                     for line in output.splitlines():
                         if "UUID:" in line or "Detected UUID:" in line:
                             parts: List[str] = line.replace("Detected UUID:", "UUID:").split(",")
@@ -511,6 +837,8 @@ class FlashManager:
                     return results
                 except Exception as e:
                     print(f"Katapult query error: {e}")
+                    # The bus may have gone down; re-check it on the next discovery.
+                    self._can_iface_up_until.pop(interface, None)
                     return []
 
             # Run discovery methods sequentially to avoid CAN bus contention
@@ -549,7 +877,7 @@ class FlashManager:
             if isinstance(moonraker_res, dict):
                 for identifier, info in moonraker_res.items():
                     # Check if identifier looks like a UUID (12 hex chars)
-                    if len(identifier) == 12 and all(c in '0123456789abcdef' for c in identifier):
+                    if _is_can_uuid(identifier):
                         section_name = info["name"]
                         if identifier in seen_uuids:
                             if "CAN Device" in seen_uuids[identifier]["name"]:
@@ -586,15 +914,27 @@ class FlashManager:
             "name": "Linux Process (Host MCU)"
         }]
 
-    async def is_interface_up(self, interface: str = "can0") -> bool:
-        """Checks if a network interface is UP and has a carrier."""
+    async def is_interface_up(self, interface: str = "can0", force: bool = False) -> bool:
+        """Checks if a network interface is UP and has a carrier.
+
+        Results are reused for a short TTL unless force=True.
+        """
+        now: float = asyncio.get_event_loop().time()
+        cached: Optional[Tuple[float, bool]] = self._iface_status_cache.get(interface)
+        if not force and cached is not None and now - cached[0] < self._iface_status_ttl_s:
+            return cached[1]
+        is_up: bool = await self._single_flight(("iface_up", interface), lambda: self._is_interface_up(interface))
+        self._iface_status_cache[interface] = (asyncio.get_event_loop().time(), is_up)
+        return is_up
+
+    def _forget_interface_state(self, interface: str) -> None:
+        """Drops cached up/down state for an interface that is about to change."""
+        self._iface_status_cache.pop(interface, None)
+        self._can_iface_up_until.pop(interface, None)
+
+    async def _is_interface_up(self, interface: str) -> bool:
         try:
-            process: Process = await asyncio.create_subprocess_exec(
-                "ip", "link", "show", interface,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, _ = await process.communicate()
+            stdout = await self._run_probe("ip", "link", "show", interface)
             output = stdout.decode()
             # Interface must be UP and NOT have NO-CARRIER
             is_up = "state UP" in output or "state UNKNOWN" in output
@@ -744,7 +1084,7 @@ class FlashManager:
         if method == "serial":
             if os.path.exists(device_id):
                 # Check if it's Klipper or Katapult
-                if "katapult" in device_id.lower() or "canboot" in device_id.lower():
+                if is_bootloader_id(device_id):
                     return "ready"
                 return "service" # Assume Klipper if it exists and isn't katapult
             
@@ -756,7 +1096,7 @@ class FlashManager:
             # 2. If the path doesn't exist, it might have changed ID (e.g. Klipper -> Katapult)
             resolved_id: str = await self.resolve_serial_id(device_id)
             if resolved_id != device_id and os.path.exists(resolved_id):
-                if "katapult" in resolved_id.lower() or "canboot" in resolved_id.lower():
+                if is_bootloader_id(resolved_id):
                     return "ready"
                 return "service"
 
@@ -825,14 +1165,7 @@ import time
 
 interface = sys.argv[1]
 device_id = sys.argv[2]
-
-def crc16_ccitt(buf):
-    crc = 0xffff
-    for data in buf:
-        data ^= crc & 0xff
-        data ^= (data & 0x0f) << 4
-        crc = ((data << 8) | (crc >> 8)) ^ (data >> 4) ^ (data << 3)
-    return crc & 0xFFFF
+jump_pkt = bytes.fromhex(sys.argv[3])
 
 def send_can(id, data):
     try:
@@ -849,14 +1182,11 @@ set_id_payload = bytes([0x11]) + uuid_bytes + bytes([128])
 send_can(0x3f0, set_id_payload)
 time.sleep(0.1)
 
-cmd_body = bytes([0x15, 0x00])
-crc = crc16_ccitt(cmd_body)
-pkt = bytes([0x01, 0x88]) + cmd_body + struct.pack("<H", crc) + bytes([0x99, 0x03])
-send_can(0x200, pkt)
+send_can(0x200, jump_pkt)
 print(f"Jump command sent to UUID {device_id}")
 """
                 process: Process = await asyncio.create_subprocess_exec(
-                    "python3", "-c", py_cmd, interface, device_id,
+                    "python3", "-c", py_cmd, interface, device_id, _KATAPULT_COMPLETE_PKT_HEX,
                     stdout=asyncio.subprocess.PIPE,
                     stderr=asyncio.subprocess.STDOUT
                 )
@@ -898,25 +1228,16 @@ print(f"Jump command sent to UUID {device_id}")
 
     async def reboot_to_katapult(self, device_id: str, method: str = "can", interface: str = "can0", is_bridge: bool = False, baudrate: int = 250000) -> AsyncGenerator[str, None]:
         """Sends a reboot command to a device to enter Katapult."""
+        if is_bridge:
+            self._forget_interface_state(interface) # Rebooting the bridge takes its bus down
         yield f">>> Requesting reboot to Katapult for {device_id}...\n"
         method = method.lower()
         if method == "can":
             async with self._can_lock:
                 yield f">>> CAN Lock Acquired for rebooting {device_id}\n"
                 # Using flashtool.py -r is much more reliable for all CAN nodes
-                cmd: List[str] = [
-                    "python3", os.path.join(self.katapult_dir, "scripts", "flashtool.py"),
-                    "-i", interface,
-                    "-u", device_id,
-                    "-r"
-                ]
-                process: Process = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.STDOUT
-                )
-                stdout, _ = await process.communicate()
-                yield stdout.decode()
+                _, output = await self._run_flashtool(["-i", interface, "-u", device_id, "-r"])
+                yield output
                 self._can_cache_time[interface] = 0.0 # Invalidate cache
                 yield f">>> CAN Lock Released\n"
                 return
@@ -925,10 +1246,9 @@ print(f"Jump command sent to UUID {device_id}")
         # 1. Try the 1200bps trick first (common for Katapult/CanBoot on Serial)
         yield f">>> Attempting 1200bps magic baud on {device_id}...\n"
         try:
-            import serial
-            ser = serial.Serial(device_id, 1200)
-            ser.close()
+            await self.send_magic_baud(device_id)
             await asyncio.sleep(2) # Give it time to reboot
+            self.invalidate_discovery_cache() # The device re-enumerates under a new ID
             
             # If the device path is gone, the trick worked and the device is rebooting
             if not os.path.exists(device_id):
@@ -961,6 +1281,7 @@ print(f"Jump command sent to UUID {device_id}")
                 yield line.decode()
 
             await process.wait()
+            self.invalidate_discovery_cache()
             if process.returncode == 0:
                 yield ">>> Reboot command sent. Device should appear in Katapult mode shortly.\n"
             else:
@@ -975,11 +1296,10 @@ print(f"Jump command sent to UUID {device_id}")
         yield f">>> Attempting to reboot {actual_id} into DFU mode (1200bps trick)...\n"
         try:
             # The 1200bps trick: open and close the port at 1200bps
-            import serial
-            ser = serial.Serial(actual_id, 1200)
-            ser.close()
+            await self.send_magic_baud(actual_id)
             yield ">>> 1200bps magic baud sent. Waiting 3s for USB enumeration...\n"
             await asyncio.sleep(3)
+            self.invalidate_discovery_cache()
         except Exception as e:
             yield f">>> Error sending 1200bps magic baud: {str(e)}\n"
             yield ">>> Please manually enter DFU mode (BOOT0 + RESET) if the device does not appear.\n"
@@ -995,6 +1315,7 @@ print(f"Jump command sent to UUID {device_id}")
         ]
         async for line in self._run_flash_command(cmd):
             yield line
+        self.invalidate_discovery_cache() # Jumping to the new firmware changes the by-id name
 
     async def flash_can(self, uuid: str, firmware_path: str, interface: str = "can0") -> AsyncGenerator[str, None]:
         """Flashes a device via CAN using Katapult."""
@@ -1019,7 +1340,7 @@ print(f"Jump command sent to UUID {device_id}")
         # Prevent concurrent dfu-util calls (like UI polling dfu-util -l) while flashing.
         async with self._dfu_lock:
             # Invalidate any cached dfu-util -l results since the device will transition.
-            self._dfu_cache_time = 0.0
+            self.invalidate_discovery_cache()
 
             # We try to be specific if we have a serial or path
             # device_id here could be the serial number or the path from discover_dfu_devices
@@ -1048,9 +1369,10 @@ print(f"Jump command sent to UUID {device_id}")
                     if attempt > 0:
                         yield f">>> Retry attempt {attempt + 1}/{max_retries}...\n"
                         await asyncio.sleep(2)
-                        # Re-resolve DFU device ID in case USB re-enumerated
-                        self._dfu_cache_time = 0.0
-                        new_devs = await self.discover_dfu_devices()
+                        # Re-resolve DFU device ID in case USB re-enumerated (we already
+                        # hold _dfu_lock, so scan directly rather than via discover_dfu_devices)
+                        self.invalidate_discovery_cache()
+                        new_devs = await self._scan_dfu_devices()
                         if new_devs:
                             # Rebuild the command with the potentially new device ID
                             cmd = ["sudo", "dfu-util", "-a", "0", "-d", "0483:df11", "-s", address, "-D", firmware_path]
@@ -1102,7 +1424,7 @@ print(f"Jump command sent to UUID {device_id}")
                         yield line
 
             yield ">>> Flash operation complete.\n"
-            self._dfu_cache_time = 0.0
+            self.invalidate_discovery_cache()
 
     async def flash_linux(self, firmware_path: str) -> AsyncGenerator[str, None]:
         """'Flashes' the Linux process by installing the binary to /usr/local/bin/klipper_mcu."""
@@ -1121,10 +1443,10 @@ print(f"Jump command sent to UUID {device_id}")
             # Kill any remaining processes using the file
             fuser_proc: Process = await asyncio.create_subprocess_exec(
                 "sudo", "fuser", "-k", "/usr/local/bin/klipper_mcu",
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
             )
-            await fuser_proc.communicate()
+            await fuser_proc.wait()
             await asyncio.sleep(2)
             
             # 2. Copy to /usr/local/bin/klipper_mcu
@@ -1157,16 +1479,23 @@ print(f"Jump command sent to UUID {device_id}")
             stderr=asyncio.subprocess.STDOUT
         )
 
-        while True:
-            if process.stdout is None:
-                break
-            # Read in chunks to handle progress bars (\r)
-            chunk: bytes = await process.stdout.read(128)
-            if not chunk:
-                break
-            yield chunk.decode(errors='replace')
+        try:
+            while True:
+                if process.stdout is None:
+                    break
+                # Read in chunks to handle progress bars (\r)
+                chunk: bytes = await process.stdout.read(128)
+                if not chunk:
+                    break
+                yield chunk.decode(errors='replace')
 
-        await process.wait()
+            await process.wait()
+        finally:
+            if process.returncode is None:
+                # The caller stopped early (task cancelled, client gone): don't leave the
+                # flasher running on a bus/port whose lock is being released.
+                process.terminate()
+                await process.wait()
         if process.returncode in ok_returncodes:
             yield ">>> Flashing successful!\n"
         else:
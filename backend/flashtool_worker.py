@@ -0,0 +1,65 @@
+"""Long-lived wrapper around Katapult's flashtool.py.
+
+Reads newline-delimited JSON requests of the form {"args": [...]} from stdin,
+runs flashtool's main() with those arguments and writes one JSON line
+{"returncode": int, "output": str} per request to stdout. This keeps the
+interpreter and flashtool's imports warm between short CAN queries/reboots.
+
+Usage: python3 flashtool_worker.py /path/to/katapult/scripts/flashtool.py
+"""
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import sys
+from types import ModuleType
+from typing import Any, Dict, List
+
+
+def _load_flashtool(path: str) -> ModuleType:
+    spec = importlib.util.spec_from_file_location("katapult_flashtool", path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load flashtool from {path}")
+    module: ModuleType = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _run(flashtool: ModuleType, args: List[str]) -> Dict[str, Any]:
+    output = io.StringIO()
+    returncode = 0
+    sys.argv = ["flashtool.py", *args]
+    # flashtool drives its own event loop and may close it on exit.
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            flashtool.main()
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                returncode = e.code
+            elif e.code is not None:
+                print(e.code)
+                returncode = 1
+        except Exception as e:
+            print(f"flashtool error: {e}")
+            returncode = 1
+    return {"returncode": returncode, "output": output.getvalue()}
+
+
+def main() -> None:
+    flashtool: ModuleType = _load_flashtool(sys.argv[1])
+    out = sys.stdout
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            result = _run(flashtool, json.loads(line)["args"])
+        except Exception as e:
+            result = {"returncode": 1, "output": f"Invalid worker request: {e}\n"}
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+
+if __name__ == "__main__":
+    main()
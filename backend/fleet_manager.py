@@ -1,40 +1,111 @@
+import asyncio
 import json
 import os
 import threading
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable, ClassVar, Set, Tuple
+
+# fdatasync skips the metadata flush; not every platform provides it.
+_fdatasync: Callable[[int], None] = getattr(os, "fdatasync", os.fsync)
+
+# (mtime_ns, size, inode) of a file. mtime alone misses edits within one timestamp
+# tick on coarse-grained filesystems (FAT SD cards); a rewrite via os.replace
+# always changes the inode.
+_FileStamp = Tuple[int, int, int]
+
+def _file_stamp(path: str) -> _FileStamp:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
 
 class FleetManager:
+    # Data directories already verified in this process; later managers skip the stat/makedirs.
+    _dirs_checked: ClassVar[Set[str]] = set()
+
     def __init__(self, data_dir: str) -> None:
         self.data_dir: str = data_dir
         self.fleet_file: str = os.path.join(data_dir, "fleet.json")
         self._lock = threading.Lock()
+        # Parsed fleet.json as of a given file stamp -> (stamp, devices); never handed out directly
+        self._fleet: Optional[Tuple[_FileStamp, List[Dict[str, Any]]]] = None
+        # Lookups as of a given fleet.json stamp -> (stamp, id -> device, every id and dfu_id)
+        self._index: Optional[Tuple[_FileStamp, Dict[str, Dict[str, Any]], Set[str]]] = None
         self._ensure_data_dir()
 
     def _ensure_data_dir(self) -> None:
+        if self.data_dir in FleetManager._dirs_checked:
+            return
         os.makedirs(self.data_dir, exist_ok=True)
         if not os.path.exists(self.fleet_file):
             with open(self.fleet_file, 'w') as f:
                 json.dump([], f)
+        FleetManager._dirs_checked.add(self.data_dir)
 
     def get_fleet(self) -> List[Dict[str, Any]]:
         """Returns the list of registered devices in the fleet."""
         with self._lock:
+            return self._copy_fleet()
+
+    def _read_fleet(self) -> Tuple[_FileStamp, List[Dict[str, Any]]]:
+        """Returns (file stamp, parsed fleet), re-reading fleet.json only if it changed. Called under lock.
+
+        The list is shared: use _copy_fleet() for anything that is mutated or returned.
+        """
+        stamp: _FileStamp = _file_stamp(self.fleet_file)
+        if self._fleet is None or self._fleet[0] != stamp:
             with open(self.fleet_file, 'r') as f:
-                return json.load(f)
+                self._fleet = (stamp, json.load(f))
+        return self._fleet
+
+    def _copy_fleet(self) -> List[Dict[str, Any]]:
+        """Returns a copy of the fleet that callers may modify. Called under lock."""
+        # Device entries only hold scalars, so copying each dict is enough
+        return [dict(d) for d in self._read_fleet()[1]]
+
+    def _get_index(self) -> Tuple[_FileStamp, Dict[str, Dict[str, Any]], Set[str]]:
+        """Returns the lookup index, rebuilding it if fleet.json changed. Called under lock."""
+        stamp, fleet = self._read_fleet()
+        if self._index is None or self._index[0] != stamp:
+            # First entry wins, like the linear scans this replaces
+            by_id: Dict[str, Dict[str, Any]] = {}
+            managed_ids: Set[str] = set()
+            for d in fleet:
+                by_id.setdefault(d['id'], d)
+                managed_ids.add(d['id'])
+                if d.get('dfu_id'):
+                    managed_ids.add(d['dfu_id'])
+            self._index = (stamp, by_id, managed_ids)
+        return self._index
+
+    def get_device(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the device with the given id, or None if it isn't registered."""
+        with self._lock:
+            device: Optional[Dict[str, Any]] = self._get_index()[1].get(device_id)
+        return dict(device) if device is not None else None
+
+    def get_managed_ids(self) -> Set[str]:
+        """Returns every hardware id (primary and DFU) attached to a fleet device."""
+        with self._lock:
+            return set(self._get_index()[2])
 
     def _write_fleet(self, fleet: List[Dict[str, Any]]) -> None:
         """Atomically writes the fleet data to disk."""
+        self._fleet = None
+        self._index = None
         tmp_path = self.fleet_file + ".tmp"
         with open(tmp_path, 'w') as f:
             json.dump(fleet, f, indent=4)
+            # Make sure the data hits the SD card before the rename, otherwise a
+            # power loss can leave an empty fleet.json behind the atomic replace.
+            f.flush()
+            _fdatasync(f.fileno())
         os.replace(tmp_path, self.fleet_file)
+        # What was just written is the new parsed state; no need to read it back
+        self._fleet = (_file_stamp(self.fleet_file), fleet)
 
     def save_device(self, device: Dict[str, Any]) -> None:
         """Adds or updates a device in the fleet."""
         with self._lock:
-            with open(self.fleet_file, 'r') as f:
-                fleet: List[Dict[str, Any]] = json.load(f)
+            fleet: List[Dict[str, Any]] = self._copy_fleet()
             old_id: Optional[str] = device.get('old_id')
             target_id = old_id if old_id else device['id']
             
@@ -56,16 +127,14 @@ class FleetManager:
     def remove_device(self, device_id: str) -> None:
         """Removes a device from the fleet."""
         with self._lock:
-            with open(self.fleet_file, 'r') as f:
-                fleet: List[Dict[str, Any]] = json.load(f)
+            fleet: List[Dict[str, Any]] = self._copy_fleet()
             fleet = [d for d in fleet if d['id'] != device_id]
             self._write_fleet(fleet)
 
     def update_device_version(self, device_id: str, version_info: Dict[str, Any]) -> None:
         """Updates the version information for a device after flashing."""
         with self._lock:
-            with open(self.fleet_file, 'r') as f:
-                fleet: List[Dict[str, Any]] = json.load(f)
+            fleet: List[Dict[str, Any]] = self._copy_fleet()
             for d in fleet:
                 if d['id'] == device_id:
                     d['last_flashed'] = time.strftime("%Y-%m-%d %H:%M:%S")
@@ -77,19 +146,35 @@ class FleetManager:
     def update_device_live_version(self, device_id: str, live_version: str) -> None:
         """Updates the live running version for a device (from Moonraker query)."""
         with self._lock:
-            with open(self.fleet_file, 'r') as f:
-                fleet: List[Dict[str, Any]] = json.load(f)
+            fleet: List[Dict[str, Any]] = self._copy_fleet()
             for d in fleet:
                 if d['id'] == device_id:
                     d['live_version'] = live_version
                     break
             self._write_fleet(fleet)
 
+    async def refresh_all_live_versions(self, query_fn: Callable[[str], Awaitable[Optional[str]]]) -> Dict[str, str]:
+        """Queries the live version of every device concurrently and persists them in a single write."""
+        fleet: List[Dict[str, Any]] = self.get_fleet()
+        results = await asyncio.gather(*(query_fn(d['id']) for d in fleet), return_exceptions=True)
+        live_versions: Dict[str, str] = {
+            d['id']: result for d, result in zip(fleet, results) if isinstance(result, str)
+        }
+        if not live_versions:
+            return live_versions
+
+        with self._lock:
+            fleet = self._copy_fleet()
+            for d in fleet:
+                if d['id'] in live_versions:
+                    d['live_version'] = live_versions[d['id']]
+            self._write_fleet(fleet)
+        return live_versions
+
     def rename_profile(self, old_name: str, new_name: str) -> None:
         """Updates all fleet devices referencing a given profile to the new name."""
         with self._lock:
-            with open(self.fleet_file, 'r') as f:
-                fleet: List[Dict[str, Any]] = json.load(f)
+            fleet: List[Dict[str, Any]] = self._copy_fleet()
             changed = False
             for d in fleet:
                 if d.get('profile') == old_name:
@@ -1,18 +1,75 @@
 import asyncio
+import hashlib
+import itertools
 import os
 import sys
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, ClassVar, Tuple, Iterator, Set
 
 # Global placeholder for the kconfiglib module
 kconfiglib: Any = None
 _is_klipper_kconfiglib = False
+# kconfiglib type constant -> UI type name, filled in once kconfiglib is imported
+_TYPE_NAMES: Dict[int, str] = {}
+# Hot kconfiglib names bound once kconfiglib is imported, used per node when serializing
+_expr_value: Any = None
+_Symbol: Any = None
+_Choice: Any = None
+# bool/tristate type constants, and user strings -> tri values, for can_set
+_TRI_TYPES: Tuple[int, ...] = ()
+_TRI_VALUES: Dict[str, int] = {"n": 0, "m": 1, "y": 2}
+
+# Number of previews (profile + unsaved values) whose menu trees are kept
+_PREVIEW_CACHE_SIZE = 64
+
+# Numbers each Kconfig parse, so preview keys never match a tree from an older
+# parse (unlike id(), which can be reused once the old Kconfig is collected)
+_parse_ids: Iterator[int] = itertools.count(1)
+# Distinguishes this process in ETags, since parse ids restart from 1 on every launch
+_PROCESS_TOKEN: str = os.urandom(8).hex()
+
+# (mtime_ns, size, inode) of a profile. mtime alone misses a re-save within one
+# timestamp tick on coarse-grained filesystems (FAT SD cards).
+_FileStamp = Tuple[int, int, int]
+
+def _file_stamp(path: str) -> _FileStamp:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
 
 class KconfigManager:
+    # Parsed Kconfig trees keyed by absolute Kconfig path -> (source mtimes, Kconfig, parse id).
+    # Parsing Klipper's Kconfig takes hundreds of ms, so it is only redone when a
+    # sourced file changes (e.g. after a Klipper update).
+    _parsed_cache: ClassVar[Dict[str, Tuple[Tuple[float, ...], Any, int]]] = {}
+
     def __init__(self, klipper_dir: str) -> None:
         self.klipper_dir: str = klipper_dir
         self.kconfig_file: str = os.path.join(klipper_dir, "src", "Kconfig")
         self.kconf = None
         self._kconfig_lock: asyncio.Lock = asyncio.Lock()
+        self._load_lock: threading.Lock = threading.Lock()
+        # Last menu tree built for _node_static_kconf, keyed by (symbol values, show_optional)
+        self._tree_cache: Optional[Tuple[Tuple[Tuple[Tuple[str, str], ...], bool], List[Dict[str, Any]]]] = None
+        # Value-independent per-node fields: node -> (name, dep_str)
+        self._node_static: Dict[Any, Tuple[str, str]] = {}
+        self._node_static_kconf: Any = None
+        # Symbol/choice -> menu depth, used to order apply_values
+        self._sym_depth: Dict[Any, int] = {}
+        # Names that failed in set_value during the current apply_values pass, and
+        # every name already reported (so each is only printed once)
+        self._set_errors: List[str] = []
+        self._reported_errors: Set[str] = set()
+        # Choice member symbol -> shared (read-only) option entry
+        self._choice_options: Dict[Any, Dict[str, str]] = {}
+        # .config path -> (Kconfig, file stamp, symbol user values, choice mode/selection)
+        # recorded after load_config, so an unchanged profile skips re-reading the file
+        self._config_values_cache: Dict[str, Tuple[Any, _FileStamp, List[Tuple[Any, Any]], List[Tuple[Any, Any, Any]]]] = {}
+        # LRU of build_menu_tree results keyed by (parse id, profile, profile stamp, values, show_optional)
+        self._preview_cache: "OrderedDict[Tuple[Any, ...], Tuple[List[Dict[str, Any]], List[str]]]" = OrderedDict()
+        # Profile path -> number of save_values writes, so ETags change even when a
+        # rewrite leaves the file stamp as it was
+        self._save_counts: Dict[str, int] = {}
         self._import_kconfiglib()
 
     @property
@@ -20,9 +77,23 @@ class KconfigManager:
         return _is_klipper_kconfiglib
 
     def _import_kconfiglib(self) -> None:
+        global _expr_value, _Symbol, _Choice, _TRI_TYPES
+        if kconfiglib is None:
+            self._find_kconfiglib()
+        _expr_value, _Symbol, _Choice = kconfiglib.expr_value, kconfiglib.Symbol, kconfiglib.Choice
+        _TRI_TYPES = (kconfiglib.BOOL, kconfiglib.TRISTATE)
+        if not _TYPE_NAMES:
+            _TYPE_NAMES.update({
+                kconfiglib.BOOL: "bool",
+                kconfiglib.TRISTATE: "tristate",
+                kconfiglib.STRING: "string",
+                kconfiglib.INT: "int",
+                kconfiglib.HEX: "hex",
+                kconfiglib.UNKNOWN: "unknown"
+            })
+
+    def _find_kconfiglib(self) -> None:
         global kconfiglib, _is_klipper_kconfiglib
-        if kconfiglib is not None:
-            return
 
         # Try to import from Klipper's lib/kconfiglib directory
         kconfig_lib_path = os.path.join(self.klipper_dir, "lib", "kconfiglib")
@@ -50,25 +121,106 @@ class KconfigManager:
     async def load_kconfig(self, config_file: Optional[str] = None) -> None:
         """Loads the Kconfig file and optionally an existing .config file."""
         async with self._kconfig_lock:
+            await asyncio.get_event_loop().run_in_executor(None, self._load_kconfig_sync, config_file)
+
+    async def build_menu_tree(self, config_file: Optional[str], values: List[Tuple[str, Optional[str]]], show_optional: bool = False) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Loads a config, applies values and builds the menu tree in a worker thread.
+
+        Returns the tree and the names of values that could not be applied.
+        """
+        def build() -> Tuple[List[Dict[str, Any]], List[str]]:
+            key = self._preview_key(config_file, values, show_optional)
+            cached = self._preview_cache.get(key)
+            if cached is not None:
+                self._preview_cache.move_to_end(key)
+                return cached
+
+            self._load_kconfig_sync(config_file)
+            failed: List[str] = self.apply_values(values) if values else []
+            result = (self.get_menu_tree(show_optional=show_optional), failed)
+            self._preview_cache[key] = result
+            if len(self._preview_cache) > _PREVIEW_CACHE_SIZE:
+                self._preview_cache.popitem(last=False)
+            return result
+
+        # Parsing and tree building are CPU-bound; keep them off the event loop.
+        # The lock still serializes requests since they share self.kconf.
+        async with self._kconfig_lock:
+            return await asyncio.get_event_loop().run_in_executor(None, build)
+
+    async def menu_tree_entries(self, config_file: Optional[str], show_optional: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+        """Loads a config and collects iter_menu_tree() in a worker thread.
+
+        The walk runs under the lock, so a concurrent request can't reload
+        self.kconf while it is being read.
+        """
+        def collect() -> List[Tuple[int, Dict[str, Any]]]:
             self._load_kconfig_sync(config_file)
+            return list(self.iter_menu_tree(show_optional=show_optional))
+
+        async with self._kconfig_lock:
+            return await asyncio.get_event_loop().run_in_executor(None, collect)
+
+    def _preview_key(self, config_file: Optional[str], values: List[Tuple[str, Optional[str]]], show_optional: bool) -> Tuple[Any, ...]:
+        """Cache key for build_menu_tree. A Klipper update changes the parsed Kconfig and
+        an edited profile changes its file stamp, so both invalidate old entries (a
+        save_values rewrite also evicts them directly)."""
+        if not os.path.exists(self.kconfig_file):
+            raise FileNotFoundError(f"Kconfig file not found at {self.kconfig_file}")
+        with self._load_lock:
+            self._get_parsed_kconfig(reset=False)
+            parse_id: int = self._parsed_cache[os.path.abspath(self.kconfig_file)][2]
+        config_path: Optional[str] = None
+        stamp: Optional[_FileStamp] = None
+        if config_file and os.path.exists(expanded := os.path.expanduser(config_file)):
+            config_path = os.path.abspath(expanded)
+            stamp = _file_stamp(config_path)
+        return (parse_id, config_path, stamp, tuple(values), show_optional)
+
+    async def menu_tree_etag(self, config_file: Optional[str], show_optional: bool = False) -> str:
+        """HTTP validator for build_menu_tree(config_file, [], show_optional).
+
+        Changes whenever that tree could: a re-saved profile, an edited Kconfig
+        source, or a restart.
+        """
+        def compute() -> str:
+            key = self._preview_key(config_file, [], show_optional)
+            source_mtimes = self._parsed_cache[os.path.abspath(self.kconfig_file)][0]
+            save_count: int = self._save_counts.get(key[1], 0)
+            return hashlib.blake2b(repr((_PROCESS_TOKEN, source_mtimes, save_count, key)).encode(), digest_size=16).hexdigest()
+
+        async with self._kconfig_lock:
+            return await asyncio.get_event_loop().run_in_executor(None, compute)
+
+    async def save_values(self, config_file: Optional[str], values: List[Tuple[str, Optional[str]]], output_path: str) -> List[str]:
+        """Loads a config, applies values and writes the result in a worker thread.
+
+        Returns the names of values that could not be applied.
+        """
+        def save() -> List[str]:
+            self._load_kconfig_sync(config_file)
+            failed: List[str] = self.apply_values(values)
+            self.save_config(output_path)
+            # The file may keep its stamp if rewritten within one timestamp tick
+            saved_path: str = os.path.abspath(output_path)
+            self._config_values_cache.pop(saved_path, None)
+            self._save_counts[saved_path] = self._save_counts.get(saved_path, 0) + 1
+            for key in [key for key in self._preview_cache if key[1] == saved_path]:
+                del self._preview_cache[key]
+            return failed
+
+        async with self._kconfig_lock:
+            return await asyncio.get_event_loop().run_in_executor(None, save)
 
     def _load_kconfig_sync(self, config_file: Optional[str] = None) -> None:
         """Internal synchronous kconfig loading, called under lock."""
-        # Set environment variables that Klipper's Kconfig expects
-        abs_klipper_dir: str = os.path.abspath(self.klipper_dir)
-        os.environ["SRCTREE"] = abs_klipper_dir
-        os.environ["srctree"] = abs_klipper_dir
-        
         if not os.path.exists(self.kconfig_file):
             raise FileNotFoundError(f"Kconfig file not found at {self.kconfig_file}")
 
-        # Save current CWD and switch to klipper_dir so relative 'source' paths resolve
-        old_cwd: str = os.getcwd()
-        os.chdir(abs_klipper_dir)
-        try:
-            # kconfiglib.Kconfig will use the environment variables to resolve 'source' paths
-            self.kconf = kconfiglib.Kconfig(self.kconfig_file, warn=False)
-            
+        # Also taken here since get_menu_tree/set_value may load without the async lock
+        with self._load_lock:
+            self.kconf = self._get_parsed_kconfig()
+
             # Force certain symbols to 'y' to improve UX (e.g. show optimization menus)
             for sym_name in ["HAVE_LIMITED_CODE_SIZE", "LOW_LEVEL_OPTIONS"]:
                 if sym_name in self.kconf.syms:
@@ -81,10 +233,70 @@ class KconfigManager:
                         # so we'll handle visibility in the tree parser instead.
                         pass
 
+            # Relative paths are resolved against $srctree by kconfiglib
             if config_file and os.path.exists(config_path := os.path.expanduser(config_file)):
-                self.kconf.load_config(config_path)
-        finally:
-            os.chdir(old_cwd)
+                self._load_config_cached(config_path)
+
+    def _load_config_cached(self, config_path: str) -> None:
+        """load_config(), replaying the resulting user values if this unchanged file was loaded before."""
+        assert self.kconf is not None
+        key: str = os.path.abspath(config_path)
+        stamp: _FileStamp = _file_stamp(config_path)
+        cached = self._config_values_cache.get(key)
+        if cached is not None and cached[0] is self.kconf and cached[1] == stamp:
+            _, _, sym_values, choice_values = cached
+            self.kconf.unset_values()
+            for sym, value in sym_values:
+                sym.set_value(value)
+            for choice, mode, selection in choice_values:
+                if mode is not None:
+                    choice.set_value(mode)
+                if selection is not None:
+                    selection.set_value(2)
+            return
+
+        self.kconf.load_config(config_path)
+        self._config_values_cache[key] = (
+            self.kconf,
+            stamp,
+            [(sym, sym.user_value) for sym in self.kconf.unique_defined_syms if sym.user_value is not None],
+            [(choice, choice.user_value, choice.user_selection) for choice in self.kconf.unique_choices
+             if choice.user_value is not None or choice.user_selection is not None],
+        )
+
+    def _get_parsed_kconfig(self, reset: bool = True) -> Any:
+        """Returns a parsed Kconfig with no user values, reusing a cached parse when possible.
+
+        With reset=False a cached parse is returned with its current values left as they are.
+        """
+        key: str = os.path.abspath(self.kconfig_file)
+        cached = self._parsed_cache.get(key)
+        if cached is not None:
+            mtimes, kconf, _ = cached
+            if self._source_mtimes(kconf) == mtimes:
+                if reset:
+                    kconf.unset_values()
+                return kconf
+
+        # kconfiglib reads $srctree when parsing to resolve 'source' paths, so the
+        # environment only needs to be right for an actual parse (no chdir needed).
+        abs_klipper_dir: str = os.path.abspath(self.klipper_dir)
+        os.environ["SRCTREE"] = abs_klipper_dir
+        os.environ["srctree"] = abs_klipper_dir
+        kconf = kconfiglib.Kconfig(key, warn=False)
+        self._parsed_cache[key] = (self._source_mtimes(kconf), kconf, next(_parse_ids))
+        return kconf
+
+    @staticmethod
+    def _source_mtimes(kconf: Any) -> Tuple[float, ...]:
+        """mtimes of every file the Kconfig tree was parsed from (relative to srctree/CWD)."""
+        mtimes: List[float] = []
+        for filename in kconf.kconfig_filenames:
+            try:
+                mtimes.append(os.stat(os.path.join(kconf.srctree, filename)).st_mtime)
+            except OSError:
+                mtimes.append(-1.0)
+        return tuple(mtimes)
 
     def get_menu_tree(self, show_optional: bool = False) -> List[Dict[str, Any]]:
         """Returns a JSON-serializable tree of the Kconfig menu."""
@@ -92,52 +304,95 @@ class KconfigManager:
             self._load_kconfig_sync()
         
         assert self.kconf is not None
-        return self._parse_menu_item(self.kconf.top_node, show_optional=show_optional)
+        self._sync_kconf_caches()
+
+        # Every visibility/value in the tree derives from the symbol values, so an
+        # unchanged set of values (e.g. re-opening a profile) reuses the last tree.
+        # The values themselves are the key, so equal hashes can't return the wrong tree.
+        signature: Tuple[Tuple[str, str], ...] = tuple((sym.name, sym.str_value) for sym in self.kconf.unique_defined_syms)
+        key: Tuple[Tuple[Tuple[str, str], ...], bool] = (signature, show_optional)
+        if self._tree_cache is not None and self._tree_cache[0] == key:
+            return self._tree_cache[1]
+
+        tree: List[Dict[str, Any]] = self._parse_menu_item(self.kconf.top_node, show_optional=show_optional)
+        self._tree_cache = (key, tree)
+        return tree
+
+    def iter_menu_tree(self, show_optional: bool = False) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yields (depth, entry) for each visible menu node in pre-order, without nesting.
+
+        Entries carry no "children" key; a node's children are the entries that
+        directly follow it with depth + 1.
+        """
+        if not self.kconf:
+            self._load_kconfig_sync()
+
+        assert self.kconf is not None
+        self._sync_kconf_caches()
+        stack: List[Tuple[int, Any]] = [(0, self.kconf.top_node.list)]
+        while stack:
+            depth, curr = stack.pop()
+            while curr:
+                item: Optional[Dict[str, Any]] = self._serialize_node(curr, show_optional=show_optional)
+                following = curr.next
+                if item:
+                    yield depth, item
+                    if curr.list:
+                        # Descend first, then resume with the next sibling
+                        if following:
+                            stack.append((depth, following))
+                        stack.append((depth + 1, curr.list))
+                        break
+                curr = following
+
+    def _sync_kconf_caches(self) -> None:
+        """Drops per-node/per-symbol caches built for a previous Kconfig object."""
+        if self._node_static_kconf is not self.kconf:
+            self._node_static = {}
+            self._sym_depth = {}
+            self._choice_options = {}
+            self._tree_cache = None
+            self._node_static_kconf = self.kconf
 
     def _parse_menu_item(self, node, show_optional: bool = False) -> List[Dict[str, Any]]:
-        items = []
-        curr = node.list
-        while curr:
-            item: Dict[str, Any] | None = self._serialize_node(curr, show_optional=show_optional)
-            if item:
-                # Recursively parse children if it's a menu or has a list
-                if curr.list:
-                    item["children"] = self._parse_menu_item(curr, show_optional=show_optional)
-                items.append(item)
-            curr = curr.next
+        """Serializes the children of node, walking the menu tree with an explicit stack."""
+        items: List[Dict[str, Any]] = []
+        # (list to append serialized siblings to, first sibling node)
+        stack: List[Tuple[List[Dict[str, Any]], Any]] = [(items, node.list)]
+        while stack:
+            parent_items, curr = stack.pop()
+            while curr:
+                item: Optional[Dict[str, Any]] = self._serialize_node(curr, show_optional=show_optional)
+                if item:
+                    # Children are filled in when their entry is popped off the stack
+                    if curr.list:
+                        item["children"] = []
+                        stack.append((item["children"], curr.list))
+                    parent_items.append(item)
+                curr = curr.next
         return items
 
     def _serialize_node(self, node, show_optional: bool = False) -> Optional[Dict[str, Any]]:
         """Serializes a Kconfig node into a dictionary for the UI."""
         sym = node.item
         
-        # Only show items with prompts (standard Kconfig behavior)
+        # Only show items with prompts (standard Kconfig behavior). Returning None
+        # here also prunes the node's whole subtree from the walk, so hidden
+        # submenus are never descended into.
         if not node.prompt:
             return None
 
-        # Check symbol visibility if it's a symbol or choice
-        if isinstance(sym, (kconfiglib.Symbol, kconfiglib.Choice)):
-            # Symbols with no prompt are internal, don't show them
-            if not node.prompt:
-                return None
-            
-            # Force visibility for WANT_ symbols (Optional Features) if requested
-            is_want_sym = show_optional and sym.name and (sym.name.startswith("WANT_") or sym.name.startswith("CONFIG_WANT_"))
-            
-            # If it has a prompt but is currently invisible due to dependencies
-            if not is_want_sym and sym.visibility == 0:
-                return None
+        # kconfiglib's Symbol/Choice are never subclassed, so an identity check suffices
+        sym_type = type(sym)
+        is_choice: bool = sym_type is _Choice
 
         # If it's a menu or comment
-        if not isinstance(sym, (kconfiglib.Symbol, kconfiglib.Choice)):
-            if not node.prompt:
-                return None
-            
+        if not is_choice and sym_type is not _Symbol:
             prompt_text, prompt_cond = node.prompt
             # Force "Optional features" menu to be visible if requested
             is_optional_menu = show_optional and "Optional features" in prompt_text
             
-            if not is_optional_menu and kconfiglib.expr_value(prompt_cond) == 0:
+            if not is_optional_menu and _expr_value(prompt_cond) == 0:
                 return None
 
             return {
@@ -147,52 +402,57 @@ class KconfigManager:
                 "visible": True,
             }
 
+        # Force visibility for WANT_ symbols (Optional Features) if requested
+        is_want_sym = show_optional and sym.name and (sym.name.startswith("WANT_") or sym.name.startswith("CONFIG_WANT_"))
+
+        # If it has a prompt but is currently invisible due to dependencies
+        if not is_want_sym and sym.visibility == 0:
+            return None
+
         # Handle Symbols and Choices
-        type_map: Dict[int, str] = {
-            kconfiglib.BOOL: "bool",
-            kconfiglib.TRISTATE: "tristate",
-            kconfiglib.STRING: "string",
-            kconfiglib.INT: "int",
-            kconfiglib.HEX: "hex",
-            kconfiglib.UNKNOWN: "unknown"
-        }
-        
-        # Generate a unique name for anonymous choices using prompt and line number
-        if isinstance(sym, kconfiglib.Choice) and not sym.name:
-            name: str = f"__choice_{node.prompt[0]}_{node.linenr}"
-        else:
-            name: str = sym.name if hasattr(sym, 'name') and sym.name else f"__node_{node.prompt[0]}_{node.linenr}"
+        static = self._node_static.get(node)
+        if static is None:
+            # Generate a unique name for anonymous choices using prompt and line number
+            if is_choice and not sym.name:
+                name: str = f"__choice_{node.prompt[0]}_{node.linenr}"
+            else:
+                name: str = sym.name or f"__node_{node.prompt[0]}_{node.linenr}"
+            static = self._node_static[node] = (name, str(node.dep))
+        name, dep_str = static
 
         entry = {
             "name": name,
-            "type": type_map.get(sym.type, "unknown"),
+            "type": _TYPE_NAMES.get(sym.type, "unknown"),
             "prompt": node.prompt[0],
             "default": sym.str_value,
             "value": sym.str_value,
             "help": getattr(node, 'help', None),
-            "visible": kconfiglib.expr_value(node.dep) > 0 or (show_optional and name and "WANT_" in name),
-            "dep_str": str(node.dep),
+            "visible": _expr_value(node.dep) > 0 or (show_optional and name and "WANT_" in name),
+            "dep_str": dep_str,
             "choices": [],
             "readonly": False
         }
 
-        if isinstance(sym, kconfiglib.Symbol):
+        if not is_choice:
             # If it's a symbol selected by others, it's readonly
-            if hasattr(sym, 'rev_dep') and kconfiglib.expr_value(sym.rev_dep) > 0:
+            if _expr_value(sym.rev_dep) > 0:
                 entry["readonly"] = True
-        
-        if isinstance(sym, kconfiglib.Choice):
+        else:
             entry["type"] = "choice"
             
             # Filter visible choices first
             visible_choices = []
             for choice_sym in sym.syms:
                 if choice_sym.visibility > 0:
-                    visible_choices.append({
-                        "name": choice_sym.name,
-                        "prompt": choice_sym.nodes[0].prompt[0] if choice_sym.nodes and choice_sym.nodes[0].prompt else choice_sym.name,
-                        "value": choice_sym.name
-                    })
+                    # Option entries never change for a given Kconfig, so they are built once
+                    option = self._choice_options.get(choice_sym)
+                    if option is None:
+                        option = self._choice_options[choice_sym] = {
+                            "name": choice_sym.name,
+                            "prompt": choice_sym.nodes[0].prompt[0] if choice_sym.nodes and choice_sym.nodes[0].prompt else choice_sym.name,
+                            "value": choice_sym.name
+                        }
+                    visible_choices.append(option)
             entry["choices"] = visible_choices
 
             # Determine the selected value
@@ -214,47 +474,129 @@ class KconfigManager:
 
         return entry
 
-    def set_value(self, name: str, value: str) -> None:
-        """Sets a value for a symbol in the current configuration."""
+    def apply_values(self, values: List[Tuple[str, Optional[str]]], max_passes: int = 10) -> List[str]:
+        """Applies (name, value) pairs until the configuration stops changing.
+
+        Setting one symbol can make others visible (or select them), so values are
+        re-applied in passes, shallowest menu entries first, until a pass changes
+        nothing. Returns the names that could not be set on the final pass.
+        """
         if not self.kconf:
             self._load_kconfig_sync()
-        
+
         assert self.kconf is not None
-        
-        # Handle generated choice names or direct symbol selection
-        if name and name.startswith("__choice_"):
-            # For anonymous choices, the value is the name of the symbol to select
-            if value and value in self.kconf.syms:
-                sym = self.kconf.syms[value]
-                # Only set if the choice itself is visible or the symbol is visible
-                if sym.visibility > 0:
-                    sym.set_value('y')
-                return
-        
-        # Handle generated node names (for menus/comments)
-        if name and name.startswith("__node_"):
-            return
+        self._sync_kconf_caches()
+        ordered = sorted(values, key=lambda item: self._menu_depth(item[0]))
+        for _ in range(max_passes):
+            self._set_errors = []
+            changed = False
+            for name, value in ordered:
+                if self.set_value(name, value):
+                    changed = True
+            if not changed:
+                break
+        return list(self._set_errors)
 
-        # Handle named symbols
-        if name and name in self.kconf.syms:
-            sym = self.kconf.syms[name]
-            
+    def _menu_depth(self, name: str) -> int:
+        """Depth of a symbol's first menu node (0 for unknown/generated names)."""
+        assert self.kconf is not None
+        sym = self.kconf.syms.get(name) or self.kconf.named_choices.get(name)
+        if sym is None or not sym.nodes:
+            return 0
+        depth = self._sym_depth.get(sym)
+        if depth is None:
+            depth = 0
+            node = sym.nodes[0].parent
+            while node is not None and node is not self.kconf.top_node:
+                depth += 1
+                node = node.parent
+            self._sym_depth[sym] = depth
+        return depth
+
+    def set_value(self, name: str, value: Optional[str]) -> bool:
+        """Sets a value for a symbol in the current configuration.
+
+        Returns True if the value of the named symbol (or the selected choice
+        member) changed as a result.
+        """
+        if not self.kconf:
+            self._load_kconfig_sync()
+
+        if not self.can_set(name, value):
+            return False
+        assert self.kconf is not None
+        syms = self.kconf.syms
+        watched = [sym for sym in (syms.get(name), syms.get(value) if value else None) if sym is not None]
+        before = [sym.str_value for sym in watched]
+        try:
+            self._set_value(name, value)
+        except Exception as e:
+            # Report each bad name once rather than on every pass of every request
+            self._set_errors.append(name)
+            if name not in self._reported_errors:
+                self._reported_errors.add(name)
+                print(f"Failed to set Kconfig value {name}={value!r}: {e}")
+            return False
+        return [sym.str_value for sym in watched] != before
+
+    def can_set(self, name: str, value: Optional[str]) -> bool:
+        """Returns True if name can currently take value (visible and assignable).
+
+        Used by set_value so values whose dependencies are not met yet are skipped
+        instead of being attempted on every pass.
+        """
+        if not self.kconf:
+            self._load_kconfig_sync()
+
+        assert self.kconf is not None
+        if not name:
+            return False
+        syms = self.kconf.syms
+        value_sym = syms.get(value) if value else None
+
+        # Generated names only start with "__"; real symbols skip these checks
+        if name.startswith(("__choice_", "__node_")):
+            # Menus/comments carry no value; anonymous choices select the named symbol
+            return name.startswith("__choice_") and value_sym is not None and value_sym.visibility > 0
+
+        sym = syms.get(name)
+        if sym is not None:
             # CRITICAL: Only apply the value if the symbol is currently visible.
             # This prevents "ghost" values from previous architectures (like STM32 CAN pins)
             # from being applied and triggering 'select' dependencies when they shouldn't.
             if sym.visibility == 0:
-                return
+                return False
+            if sym.choice and value_sym is not None:
+                return True
+            if sym.orig_type in _TRI_TYPES:
+                # "m" is applied as "y" for bool symbols (see _set_value)
+                return _TRI_VALUES.get(self._bool_value(sym, value) or "") in sym.assignable
+            return True
 
-            if sym.choice and value in self.kconf.syms:
-                # If it's a choice member, set it to 'y'
-                self.kconf.syms[value].set_value('y')
-            else:
-                # For non-choice symbols, set the value directly
-                sym.set_value(str(value) if value is not None else "")
-        elif name and name in self.kconf.named_choices:
-            choice = self.kconf.named_choices[name]
-            if choice.visibility > 0 and value and value in self.kconf.syms:
-                self.kconf.syms[value].set_value('y')
+        choice = self.kconf.named_choices.get(name)
+        return choice is not None and choice.visibility > 0 and value_sym is not None
+
+    def _set_value(self, name: str, value: Optional[str]) -> None:
+        """Applies a value already checked by can_set."""
+        assert self.kconf is not None
+        syms = self.kconf.syms
+        value_sym = syms.get(value) if value else None
+        sym = syms.get(name)
+        if sym is not None and not (sym.choice and value_sym is not None):
+            # For non-choice symbols, set the value directly
+            value = self._bool_value(sym, value)
+            sym.set_value(str(value) if value is not None else "")
+        elif value_sym is not None:
+            # Choices (named or anonymous) and choice members select the named symbol
+            value_sym.set_value('y')
+
+    @staticmethod
+    def _bool_value(sym: Any, value: Optional[str]) -> Optional[str]:
+        """Maps "m" to "y" for bool symbols (_TRI_TYPES[0]). kconfiglib's set_value
+        ignores "m" for a bool, which would silently drop a saved =m value."""
+        if value == "m" and sym.orig_type == _TRI_TYPES[0]:
+            return "y"
+        return value
 
     def save_config(self, output_path: str) -> None:
         """Saves the current configuration to a file."""
@@ -1,17 +1,36 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from typing import List, Dict, Any, Optional, AsyncGenerator, Tuple, Callable, Set, Awaitable
 import os
 import asyncio
+import functools
+import json
 import logging
 import subprocess
 import sys
 import re
 import uuid
+from collections import deque
+from itertools import islice
 from asyncio.subprocess import Process
 
+try:
+    import orjson
+except ImportError:
+    # Optional: only used to speed up encoding of the Kconfig tree and polled fleet data
+    orjson = None
+
+try:
+    import ormsgpack as msgpack
+except ImportError:
+    try:
+        import msgpack
+    except ImportError:
+        # Optional: only used when a client asks for a MessagePack tree stream
+        msgpack = None
+
 logger = logging.getLogger("klipperfleet")
 
 # Ensure the backend package directory is first on sys.path so local module
@@ -22,13 +41,13 @@ try:
     # Use package-qualified imports so uvicorn can import when run as a module
     from backend.kconfig_manager import KconfigManager
     from backend.build_manager import BuildManager
-    from backend.flash_manager import FlashManager
+    from backend.flash_manager import FlashManager, diff_device_ids, is_bootloader_id
     from backend.fleet_manager import FleetManager
 except Exception:
     # Fallback to local imports for interactive runs
     from kconfig_manager import KconfigManager
     from build_manager import BuildManager
-    from flash_manager import FlashManager
+    from flash_manager import FlashManager, diff_device_ids, is_bootloader_id
     from fleet_manager import FleetManager
 
 app = FastAPI(title="KlipperFleet API", version="1.1.1-alpha")
@@ -39,6 +58,9 @@ KATAPULT_DIR: str = os.path.abspath(os.path.expanduser(os.getenv("KATAPULT_DIR",
 DATA_DIR: str = os.path.abspath(os.path.expanduser(os.getenv("DATA_DIR", "~/printer_data/config/klipperfleet")))
 PROFILES_DIR: str = os.path.join(DATA_DIR, "profiles")
 ARTIFACTS_DIR: str = os.path.join(DATA_DIR, "artifacts")
+# The KlipperFleet checkout this backend runs from
+REPO_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPDATE_SCRIPT: str = os.path.join(REPO_DIR, "update.sh")
 
 def _detect_firmware_name(firmware_dir: str) -> str:
     """Detects whether the firmware directory contains Klipper or a fork (e.g. Kalico).
@@ -85,6 +107,9 @@ build_mgr = BuildManager(KLIPPER_DIR, ARTIFACTS_DIR)
 flash_mgr = FlashManager(KLIPPER_DIR, KATAPULT_DIR)
 fleet_mgr = FleetManager(DATA_DIR)
 
+# Non-bridge devices flashed concurrently by batch operations
+BATCH_FLASH_WORKERS: int = 4
+
 # Profile name validation: only alphanumeric, underscores, hyphens, and dots
 _PROFILE_NAME_RE = re.compile(r'^[a-zA-Z0-9 _.-]+$')
 
@@ -93,38 +118,152 @@ def validate_profile_name(name: str) -> None:
     if not name or not _PROFILE_NAME_RE.match(name) or '..' in name:
         raise HTTPException(status_code=400, detail=f"Invalid profile name: '{name}'. Only alphanumeric characters, spaces, underscores, hyphens, and dots are allowed.")
 
+def profile_config_path(name: str) -> str:
+    """Path of a profile's .config file (the name is not validated here)."""
+    return f"{PROFILES_DIR}{os.sep}{name}.config"
+
+def _existing_profile_path(profile: Optional[str]) -> Optional[str]:
+    """Resolves an optional profile name to its .config path, raising 404 if it doesn't exist."""
+    if not profile:
+        return None
+    config_path: str = profile_config_path(profile)
+    if not os.path.exists(config_path):
+        raise HTTPException(status_code=404, detail=f"Profile {profile} not found")
+    return config_path
+
+# The selected *_FLASH_START_<hex> option (CONFIG_FLASH_START or CONFIG_STM32_FLASH_START)
+# holds the application offset past the bootloader, relative to the STM32 flash base.
+_FLASH_BASE: int = 0x08000000
+_FLASH_START_RE = re.compile(r"_FLASH_START_([0-9A-Fa-f]+)=y$")
+# Batch summary colour per result; SKIPPED (...) results are matched by prefix
+_SUMMARY_COLORS: Dict[str, str] = {"SUCCESS": "GREEN", "EXCLUDED": "YELLOW"}
+
+def _summary_color(result: str) -> str:
+    """Colour marker for a build/flash result line in the batch summary."""
+    return "YELLOW" if result.startswith("SKIPPED") else _SUMMARY_COLORS.get(result, "RED")
+
+# Markers BuildManager.run_build emits when a build step fails
+_BUILD_FAILED_RE = re.compile(r"!!! Error|Build failed")
+
 def get_flash_offset(profile_name: str) -> str:
     """Extracts the flash offset address from a profile's .config file."""
-    config_path: str = os.path.join(PROFILES_DIR, f"{profile_name}.config")
-    if not os.path.exists(config_path):
+    config_path: str = profile_config_path(profile_name)
+    try:
+        mtime_ns: int = os.stat(config_path).st_mtime_ns
+    except OSError:
         return "0x08000000"
-    
-    # Common Klipper offsets (handles both CONFIG_FLASH_START and CONFIG_STM32_FLASH_START)
-    offsets: Dict[str, str] = {
-        "_FLASH_START_800": "0x08000800",   # 2KiB
-        "_FLASH_START_2000": "0x08002000",  # 8KiB
-        "_FLASH_START_4000": "0x08004000",  # 16KiB
-        "_FLASH_START_8000": "0x08008000",  # 32KiB
-        "_FLASH_START_10000": "0x08010000", # 64KiB
-        "_FLASH_START_20000": "0x08020000", # 128KiB
-        "_FLASH_START_0": "0x08000000",
-    }
-    
+    return _flash_offset_for(config_path, mtime_ns)
+
+@functools.lru_cache(maxsize=256)
+def _flash_offset_for(config_path: str, mtime_ns: int) -> str:
+    """Reads the offset from one version of a .config (keyed by mtime, so edits are picked up)."""
     try:
         with open(config_path, 'r') as f:
-            content: str = f.read()
-            for key, addr in offsets.items():
-                if f"{key}=y" in content:
-                    return addr
+            # Stop at the first match instead of reading the rest of the file
+            for line in f:
+                if "_FLASH_START_" not in line:
+                    continue
+                match = _FLASH_START_RE.search(line)
+                if match:
+                    return f"0x{_FLASH_BASE + int(match.group(1), 16):08x}"
     except Exception:
         logger.warning("Failed to read config file %s for bootloader offset, using default", config_path, exc_info=True)
     return "0x08000000"
 
+# Cached listing of PROFILES_DIR. Creating, deleting or renaming a profile bumps the
+# directory's mtime, so the listing is only rescanned when that changes. Size and
+# inode are compared too, since coarse SD card timestamps can hide a change.
+_profile_names_stamp: Optional[Tuple[int, int, int]] = None
+_profile_names: List[str] = []
+# Per-profile metadata keyed by profile name -> (file mtime_ns, info)
+_profile_info_cache: Dict[str, Tuple[int, Dict[str, bool]]] = {}
+
+def _list_profile_names() -> List[str]:
+    """Returns the names of all saved profiles, rescanning only when PROFILES_DIR changes."""
+    global _profile_names_stamp, _profile_names
+    st: os.stat_result = os.stat(PROFILES_DIR)
+    stamp: Tuple[int, int, int] = (st.st_mtime_ns, st.st_size, st.st_ino)
+    if stamp != _profile_names_stamp:
+        with os.scandir(PROFILES_DIR) as it:
+            _profile_names = [entry.name[:-7] for entry in it if entry.name.endswith(".config")]
+        _profile_names_stamp = stamp
+    return list(_profile_names)
+
+async def _aexists(path: str) -> bool:
+    """os.path.exists() in the default executor, so slow storage doesn't stall the event loop."""
+    return await asyncio.get_event_loop().run_in_executor(None, os.path.exists, path)
+
+# Firmware paths recently seen on disk -> loop time, so a batch flashing several
+# devices with the same profile stats its firmware once. Only hits are cached,
+# so a fresh build is never reported missing.
+_firmware_seen: Dict[str, float] = {}
+_FIRMWARE_SEEN_TTL_S: float = 1.0
+
+async def _firmware_exists(path: str) -> bool:
+    """_aexists() for build artifacts, reusing a recent positive result."""
+    now: float = asyncio.get_event_loop().time()
+    if now - _firmware_seen.get(path, float("-inf")) < _FIRMWARE_SEEN_TTL_S:
+        return True
+    if not await _aexists(path):
+        _firmware_seen.pop(path, None)
+        return False
+    _firmware_seen[path] = asyncio.get_event_loop().time()
+    return True
+
+async def _find_bootloader_serial(initial_serials: Set[str]) -> Tuple[Optional[str], bool]:
+    """One poll for a device that rebooted into its serial bootloader.
+
+    Prefers a serial device that wasn't present before the reboot, falling back to any
+    Katapult/CanBoot one. Returns (device id or None, whether it was a new device).
+    """
+    current_ids: List[str] = [d['id'] for d in await flash_mgr.discover_serial_devices(skip_moonraker=True)]
+    added, _ = diff_device_ids(initial_serials, current_ids)
+    if added:
+        return added[0], True
+    return next((cid for cid in current_ids if is_bootloader_id(cid)), None), False
+
+async def _wait_usb_change_or_cancel(task_id: Optional[str], timeout: float) -> None:
+    """flash_mgr.wait_for_usb_change that also returns as soon as task_id is cancelled."""
+    if task_id is None:
+        await flash_mgr.wait_for_usb_change(timeout)
+        return
+    waiters = {
+        asyncio.ensure_future(flash_mgr.wait_for_usb_change(timeout)),
+        asyncio.ensure_future(task_store.cancel_event(task_id).wait()),
+    }
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+
+async def _poll_backoff(timeout: float, first: float = 0.25, longest: float = 1.0, task_id: Optional[str] = None) -> AsyncGenerator[None, None]:
+    """Yields after sleeps growing from first to longest seconds, until timeout seconds have passed.
+
+    A sleep ends early when a USB/tty device is plugged or unplugged (if udev monitoring is available),
+    or when task_id is given and that task gets cancelled.
+    """
+    loop = asyncio.get_event_loop()
+    deadline: float = loop.time() + timeout
+    delay: float = first
+    while loop.time() < deadline:
+        await _wait_usb_change_or_cancel(task_id, delay)
+        delay = min(delay * 1.5, longest)
+        yield
+
 class TaskStore:
     MAX_COMPLETED_TASKS: int = 50
+    # Log lines kept in memory per task; older lines are dropped (see log_count)
+    MAX_LOG_LINES: int = 10000
 
     def __init__(self) -> None:
         self.tasks: Dict[str, Dict[str, Any]] = {}
+        # Live log followers per task (see /task/stream) receiving (log index, line); None marks completion
+        self._subscribers: Dict[str, List["asyncio.Queue[Optional[Tuple[int, str]]]"]] = {}
+        # Ids of tasks whose status is still "running", in creation order
+        self._running: Dict[str, None] = {}
+        # Set when a task is cancelled, so waits can end immediately (see cancel_event)
+        self._cancel_events: Dict[str, asyncio.Event] = {}
 
     def _cleanup(self) -> None:
         """Purge oldest completed tasks when the limit is exceeded."""
@@ -137,20 +276,50 @@ class TaskStore:
         to_remove = len(completed) - self.MAX_COMPLETED_TASKS
         for tid, _ in completed[:to_remove]:
             del self.tasks[tid]
+            self._cancel_events.pop(tid, None)
 
     def create_task(self, task_id: str) -> None:
         self._cleanup()
         self.tasks[task_id] = {
             "status": "running", 
-            "logs": [], 
+            "logs": deque(maxlen=self.MAX_LOG_LINES),
+            "log_count": 0, # Total lines ever added; the cursor for get_logs_since
             "completed": False, 
             "cancelled": False,
             "device_statuses": {} # Real-time status overrides (id -> status)
         }
+        self._running[task_id] = None
 
     def add_log(self, task_id: str, log: str) -> None:
         if task_id in self.tasks:
+            index: int = self.tasks[task_id]["log_count"]
             self.tasks[task_id]["logs"].append(log)
+            self.tasks[task_id]["log_count"] += 1
+            for queue in self._subscribers.get(task_id, ()):
+                queue.put_nowait((index, log))
+
+    def subscribe(self, task_id: str) -> "asyncio.Queue[Optional[Tuple[int, str]]]":
+        """Returns a queue that receives (index, line) for the task's logs so far, then each new one, then None.
+
+        Indexes count every line ever added, matching the get_logs_since cursor.
+        """
+        queue: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue()
+        task = self.tasks[task_id]
+        first_kept: int = task["log_count"] - len(task["logs"])
+        for index, log in enumerate(task["logs"], first_kept):
+            queue.put_nowait((index, log))
+        if task["completed"]:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.setdefault(task_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: "asyncio.Queue[Optional[Tuple[int, str]]]") -> None:
+        queues = self._subscribers.get(task_id)
+        if queues and queue in queues:
+            queues.remove(queue)
+            if not queues:
+                del self._subscribers[task_id]
 
     def update_device_status(self, task_id: str, device_id: str, status: str) -> None:
         if task_id in self.tasks:
@@ -165,20 +334,63 @@ class TaskStore:
         if task_id in self.tasks:
             self.tasks[task_id]["cancelled"] = True
             self.tasks[task_id]["status"] = "cancelled"
-            self.tasks[task_id]["logs"].append("\n!!! TASK CANCELLED BY USER !!!\n")
+            self._running.pop(task_id, None)
+            event = self._cancel_events.get(task_id)
+            if event is not None:
+                event.set()
+            self.add_log(task_id, "\n!!! TASK CANCELLED BY USER !!!\n")
 
     def is_cancelled(self, task_id: str) -> bool:
         return self.tasks.get(task_id, {}).get("cancelled", False)
 
+    def cancel_event(self, task_id: str) -> asyncio.Event:
+        """Returns an event that is set once the task is cancelled."""
+        event = self._cancel_events.get(task_id)
+        if event is None:
+            event = self._cancel_events[task_id] = asyncio.Event()
+            if self.is_cancelled(task_id):
+                event.set()
+        return event
+
+    async def wait_cancelled(self, task_id: str, timeout: float) -> bool:
+        """Sleeps up to timeout seconds, returning early (True) if the task is cancelled."""
+        try:
+            await asyncio.wait_for(self.cancel_event(task_id).wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.is_cancelled(task_id)
+
     def complete_task(self, task_id: str, status: str = "completed") -> None:
         if task_id in self.tasks:
             if not self.tasks[task_id]["cancelled"]:
                 self.tasks[task_id]["status"] = status
             self.tasks[task_id]["completed"] = True
+            self._running.pop(task_id, None)
+            self._cancel_events.pop(task_id, None)
+            for queue in self._subscribers.pop(task_id, ()):
+                queue.put_nowait(None)
+
+    def running_overview(self) -> Tuple[Dict[str, str], bool, bool]:
+        """Returns the merged device status overrides of running tasks, whether any
+        task is running, and whether a running task holds the bus."""
+        overrides: Dict[str, str] = {}
+        is_bus_task_running: bool = False
+        for tid in self._running:
+            task = self.tasks[tid]
+            overrides.update(task["device_statuses"])
+            if task.get("is_bus_task"):
+                is_bus_task_running = True
+        return overrides, bool(self._running), is_bus_task_running
 
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         return self.tasks.get(task_id)
 
+    def get_logs_since(self, task_id: str, since: int) -> List[str]:
+        """Returns the lines added after the first `since` lines that are still kept."""
+        task = self.tasks[task_id]
+        first_kept: int = task["log_count"] - len(task["logs"])
+        return list(islice(task["logs"], max(since - first_kept, 0), None))
+
 task_store = TaskStore()
 
 class ConfigValue(BaseModel):
@@ -250,29 +462,36 @@ class ConfigPreview(BaseModel):
     values: List[ConfigValue] = []
     show_optional: bool = False
 
-@app.post("/config/tree")
-async def post_config_tree(preview: ConfigPreview, request: Request) -> List[Dict[str, Any]]:
-    """Returns the Kconfig tree with unsaved values applied for live preview."""
-    config_path: Optional[str] = None
-    if preview.profile:
-        config_path = os.path.join(PROFILES_DIR, f"{preview.profile}.config")
-        if not os.path.exists(config_path):
-            raise HTTPException(status_code=404, detail=f"Profile {preview.profile} not found")
+# Last encoded Kconfig tree. get_menu_tree returns the same list object while the
+# configuration is unchanged, so its bytes can be reused as well.
+_config_tree_json: Tuple[Optional[List[Dict[str, Any]]], bytes] = (None, b"")
+
+def _config_tree_response(tree: List[Dict[str, Any]]) -> Any:
+    """Encodes a (large) Kconfig tree with orjson, bypassing FastAPI's generic encoder."""
+    global _config_tree_json
+    if orjson is None:
+        return tree
+    if _config_tree_json[0] is not tree:
+        _config_tree_json = (tree, orjson.dumps(tree))
+    return Response(content=_config_tree_json[1], media_type="application/json")
+
+def _json_response(data: Any) -> Any:
+    """Encodes a polled JSON payload with orjson when available (FastAPI's encoder otherwise)."""
+    if orjson is None:
+        return data
+    return Response(content=orjson.dumps(data), media_type="application/json")
+
+async def _config_tree(profile: Optional[str], values: List[Tuple[str, str]], show_optional: bool) -> Any:
+    """Builds the Kconfig tree for a profile, with optional unsaved values applied."""
+    config_path: Optional[str] = _existing_profile_path(profile)
     
     try:
-        await kconfig_mgr.load_kconfig(config_path)
-        # Apply unsaved values in multiple passes to handle deep dependencies
-        for i in range(10):
-            for item in preview.values:
-                try:
-                    kconfig_mgr.set_value(item.name, item.value)
-                except Exception:
-                    # Expected: values may fail on early passes due to unresolved dependencies.
-                    # They will succeed on later passes as cascading deps resolve.
-                    if i == 9:
-                        logger.debug("Kconfig value %s=%s still failing after final pass", item.name, item.value)
-            
-        return kconfig_mgr.get_menu_tree(show_optional=preview.show_optional)
+        # Unsaved values are applied in passes until deep dependencies settle
+        tree, failed = await kconfig_mgr.build_menu_tree(config_path, values, show_optional=show_optional)
+        for name in failed:
+            logger.debug("Kconfig value %s still failing after final pass", name)
+
+        return _config_tree_response(tree)
     except FileNotFoundError:
         raise HTTPException(
             status_code=404, 
@@ -283,10 +502,60 @@ async def post_config_tree(preview: ConfigPreview, request: Request) -> List[Dic
         error_detail: str = traceback.format_exc()
         raise HTTPException(status_code=500, detail=error_detail)
 
+@app.post("/config/tree")
+async def post_config_tree(preview: ConfigPreview, request: Request) -> List[Dict[str, Any]]:
+    """Returns the Kconfig tree with unsaved values applied for live preview."""
+    return await _config_tree(preview.profile, [(item.name, item.value) for item in preview.values], preview.show_optional)
+
 @app.get("/config/tree")
-async def get_config_tree(request: Request, profile: Optional[str] = None, show_optional: bool = False) -> List[Dict[str, Any]]:
-    """Returns the full Kconfig tree, optionally loaded with a profile's values."""
-    return await post_config_tree(ConfigPreview(profile=profile, show_optional=show_optional), request)
+async def get_config_tree(request: Request, profile: Optional[str] = None, show_optional: bool = False) -> Response:
+    """Returns the full Kconfig tree, optionally loaded with a profile's values.
+
+    Responses carry an ETag, so a browser revalidating an unchanged tree gets a 304.
+    """
+    try:
+        etag: str = f'"{await kconfig_mgr.menu_tree_etag(_existing_profile_path(profile), show_optional)}"'
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404, 
+            detail="Kconfig file not found. Ensure your firmware (Klipper/Kalico) is installed and KLIPPER_DIR is set correctly. Run 'echo $KLIPPER_DIR' to verify."
+        )
+    headers: Dict[str, str] = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    result: Any = await _config_tree(profile, [], show_optional)
+    response: Response = result if isinstance(result, Response) else JSONResponse(result)
+    response.headers.update(headers)
+    return response
+
+@app.get("/config/tree/stream")
+async def stream_config_tree(request: Request, profile: Optional[str] = None, show_optional: bool = False) -> StreamingResponse:
+    """Streams the Kconfig tree as NDJSON, one {"depth": n, ...node} object per line in menu order.
+
+    Clients sending "Accept: application/msgpack" get the same objects as a
+    sequence of MessagePack values instead, when msgpack is installed.
+    """
+    try:
+        entries: List[Tuple[int, Dict[str, Any]]] = await kconfig_mgr.menu_tree_entries(_existing_profile_path(profile), show_optional)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404, 
+            detail="Kconfig file not found. Ensure your firmware (Klipper/Kalico) is installed and KLIPPER_DIR is set correctly. Run 'echo $KLIPPER_DIR' to verify."
+        )
+
+    if msgpack is not None and "application/msgpack" in request.headers.get("accept", ""):
+        # MessagePack values are self-delimiting, so no separator is needed
+        dumps, separator, media_type = msgpack.packb, b"", "application/msgpack"
+    else:
+        dumps = orjson.dumps if orjson is not None else (lambda obj: json.dumps(obj).encode())
+        separator, media_type = b"\n", "application/x-ndjson"
+
+    async def generate() -> AsyncGenerator[bytes, None]:
+        for depth, item in entries:
+            yield dumps({"depth": depth, **item}) + separator
+
+    return StreamingResponse(generate(), media_type=media_type)
 
 @app.post("/config/save")
 async def save_profile(profile: ProfileSave) -> Dict[str, str]:
@@ -297,25 +566,17 @@ async def save_profile(profile: ProfileSave) -> Dict[str, str]:
     try:
         config_path: Optional[str] = None
         if profile.base_profile:
-            config_path = os.path.join(PROFILES_DIR, f"{profile.base_profile}.config")
+            config_path = profile_config_path(profile.base_profile)
             if not os.path.exists(config_path):
                 config_path = None
         
-        await kconfig_mgr.load_kconfig(config_path)
-        # Apply values in multiple passes (matching the preview endpoint) to
+        # Apply values in passes (matching the preview endpoint) to
         # handle cascading 'select' dependencies, e.g. choosing a CAN bridge
         # communication interface triggers select USBCANBUS which must resolve
         # before save, otherwise the old value (USBSERIAL) persists.
-        for i in range(10):
-            for item in profile.values:
-                try:
-                    kconfig_mgr.set_value(item.name, item.value)
-                except Exception:
-                    if i == 9:
-                        logger.debug("Kconfig value %s=%s still failing after final save pass", item.name, item.value)
-        
-        save_path: str = os.path.join(PROFILES_DIR, f"{profile.name}.config")
-        kconfig_mgr.save_config(save_path)
+        save_path: str = profile_config_path(profile.name)
+        for name in await kconfig_mgr.save_values(config_path, [(item.name, item.value) for item in profile.values], save_path):
+            logger.debug("Kconfig value %s still failing after final save pass", name)
         return {"message": f"Profile {profile.name} saved successfully"}
     except FileNotFoundError:
         raise HTTPException(
@@ -328,39 +589,49 @@ async def save_profile(profile: ProfileSave) -> Dict[str, str]:
 @app.get("/profiles")
 async def list_profiles() -> Dict[str, List[str]]:
     """Lists all saved configuration profiles."""
-    profiles: List[str] = [f.replace(".config", "") for f in os.listdir(PROFILES_DIR) if f.endswith(".config")]
-    return {"profiles": profiles}
+    return {"profiles": await asyncio.get_event_loop().run_in_executor(None, _list_profile_names)}
 
 @app.get("/profiles/info")
 async def get_profiles_info() -> Dict[str, Dict[str, bool]]:
     """Returns metadata about all profiles (CAN bridge, Linux MCU detection)."""
+    return await asyncio.get_event_loop().run_in_executor(None, _profiles_info)
+
+def _profiles_info() -> Dict[str, Dict[str, bool]]:
+    """Reads profile metadata, reusing cached entries for unchanged files."""
     info: Dict[str, Dict[str, bool]] = {}
-    for f in os.listdir(PROFILES_DIR):
-        if not f.endswith(".config"):
-            continue
-        name = f[:-7]  # Remove .config suffix
-        config_path = os.path.join(PROFILES_DIR, f)
+    names: List[str] = _list_profile_names()
+    for name in names:
+        config_path = profile_config_path(name)
         try:
+            mtime_ns: int = os.stat(config_path).st_mtime_ns
+            cached = _profile_info_cache.get(name)
+            if cached is not None and cached[0] == mtime_ns:
+                info[name] = dict(cached[1])
+                continue
             with open(config_path, 'r') as fh:
                 content = fh.read()
                 info[name] = {
                     "is_can_bridge": "CONFIG_USBCANBUS=y" in content,
                     "is_linux": "CONFIG_MACH_LINUX=y" in content
                 }
+            _profile_info_cache[name] = (mtime_ns, dict(info[name]))
         except Exception:
             info[name] = {"is_can_bridge": False, "is_linux": False}
+    # Drop metadata for profiles that no longer exist
+    for stale in set(_profile_info_cache) - set(names):
+        del _profile_info_cache[stale]
     return info
 
 @app.delete("/profiles/{name}")
 async def delete_profile(name: str) -> Dict[str, str]:
     """Deletes a saved configuration profile."""
     validate_profile_name(name)
-    config_path: str = os.path.join(PROFILES_DIR, f"{name}.config")
-    if os.path.exists(config_path):
-        os.remove(config_path)
-        return {"message": f"Profile {name} deleted successfully"}
-    else:
+    config_path: str = profile_config_path(name)
+    try:
+        await asyncio.get_event_loop().run_in_executor(None, os.remove, config_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"Profile {name} not found")
+    return {"message": f"Profile {name} deleted successfully"}
 
 @app.post("/profiles/{name}/rename")
 async def rename_profile(name: str, body: ProfileRename) -> Dict[str, str]:
@@ -371,8 +642,8 @@ async def rename_profile(name: str, body: ProfileRename) -> Dict[str, str]:
     if name == body.new_name:
         return {"message": "Name unchanged"}
     
-    old_path = os.path.join(PROFILES_DIR, f"{name}.config")
-    new_path = os.path.join(PROFILES_DIR, f"{body.new_name}.config")
+    old_path = profile_config_path(name)
+    new_path = profile_config_path(body.new_name)
     
     if not os.path.exists(old_path):
         raise HTTPException(status_code=404, detail=f"Profile '{name}' not found")
@@ -390,7 +661,7 @@ async def rename_profile(name: str, body: ProfileRename) -> Dict[str, str]:
             os.rename(old_artifact, new_artifact)
     
     # Update fleet references
-    fleet_mgr.rename_profile(name, body.new_name)
+    await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.rename_profile, name, body.new_name)
     
     return {"message": f"Profile renamed from '{name}' to '{body.new_name}'"}
 
@@ -401,74 +672,112 @@ async def build_profile(profile: str) -> StreamingResponse:
     task_id: str = f"task_{uuid.uuid4().hex[:12]}"
     task_store.create_task(task_id)
 
-    config_path: str = os.path.join(PROFILES_DIR, f"{profile}.config")
-    if not os.path.exists(config_path):
+    config_path: str = profile_config_path(profile)
+    if not await _aexists(config_path):
         raise HTTPException(status_code=404, detail="Profile not found")
     
     async def generate() -> AsyncGenerator[str, None]:
-        async for log in build_mgr.run_build(config_path):
+        async for chunk in _coalesce_lines(build_mgr.run_build(config_path)):
             if task_store.is_cancelled(task_id): break
-            yield log
+            yield chunk
         task_store.complete_task(task_id)
 
     return StreamingResponse(generate(), media_type="text/plain", headers={"X-Task-Id": task_id})
 
+async def _coalesce_lines(source: AsyncGenerator[str, None], limit: int = 65536) -> AsyncGenerator[str, None]:
+    """Re-yields source, joining lines that are already waiting into one chunk (up to ~limit chars).
+
+    A verbose build prints lines much faster than the client reads them; this sends
+    them in a few large writes instead of one per line, without delaying a lone line.
+    The queue is bounded, so a stalled client still holds the source back.
+    """
+    queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=256)
+
+    async def pump() -> None:
+        try:
+            async for line in source:
+                await queue.put(line)
+        except Exception:
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    pump_task: "asyncio.Task[None]" = asyncio.ensure_future(pump())
+    try:
+        done: bool = False
+        while not done:
+            line: Optional[str] = await queue.get()
+            if line is None:
+                break
+            parts: List[str] = [line]
+            size: int = len(line)
+            while size < limit and not queue.empty():
+                line = queue.get_nowait()
+                if line is None:
+                    done = True
+                    break
+                parts.append(line)
+                size += len(line)
+            yield "".join(parts)
+        await pump_task
+    finally:
+        pump_task.cancel()
+        try:
+            await pump_task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Already raised above, unless the consumer stopped reading early
+            logger.debug("Line source failed after its reader stopped", exc_info=True)
+
+async def _list_klipper_units() -> List[Tuple[str, str, str]]:
+    """Returns (unit, active state, sub state) for the Klipper/Moonraker services, excluding KlipperFleet."""
+    # Exec systemctl directly and split its columns here instead of going through sh + awk.
+    # --plain drops the status bullet systemd prints in front of failed units.
+    process: Process = await asyncio.create_subprocess_exec(
+        "systemctl", "list-units", "--type=service", "--all", "--no-legend", "--plain", "klipper*", "moonraker*",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    stdout, _ = await process.communicate()
+    units: List[Tuple[str, str, str]] = []
+    for line in stdout.decode().splitlines():
+        # UNIT LOAD ACTIVE SUB DESCRIPTION...
+        parts: List[str] = line.split(None, 4)
+        if len(parts) >= 4 and parts[0].endswith(".service") and parts[0] != "klipperfleet.service":
+            units.append((parts[0], parts[2], parts[3]))
+    return units
+
 async def manage_klipper_services(action: str) -> str:
     """Stops or starts all Klipper-related services."""
     try:
-        cmd_list_str: str = "systemctl list-units --type=service --all --no-legend 'klipper*' 'moonraker*' | awk '{print $1}'"
-        process: Process = await asyncio.create_subprocess_shell(
-            cmd_list_str,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await process.communicate()
-        services: List[str] = stdout.decode().splitlines()
-        
-        target_services: List[str] = [s for s in services if s and s != "klipperfleet.service" and s.endswith(".service")]
+        target_services: List[str] = [unit for unit, _, _ in await _list_klipper_units()]
         
         if not target_services:
             return f">>> No firmware/Moonraker services found to {action}.\n"
         
-        for service in target_services:
-            cmd: List[str] = ["sudo", "systemctl", action, service]
-            proc: Process = await asyncio.create_subprocess_exec(*cmd)
-            await proc.wait()
+        # systemctl accepts several units and runs their jobs in parallel
+        cmd: List[str] = ["sudo", "systemctl", action, *target_services]
+        proc: Process = await asyncio.create_subprocess_exec(*cmd)
+        await proc.wait()
         
         past_tense_action = f"{action}ped" if action == "stop" else f"{action}ed"
         return f">>> Successfully {past_tense_action}: {', '.join(target_services)}\n"
     except Exception as e:
         return f">>> Error managing services: {str(e)}\n"
 
-async def get_services_status():
+async def get_services_status() -> List[Dict[str, Any]]:
     """Returns the status of Klipper and Moonraker services."""
     try:
-        cmd = "systemctl list-units --type=service --all --no-legend 'klipper*' 'moonraker*' | awk '{print $1, $3, $4}'"
-        process: Process = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, _ = await process.communicate()
-        lines: List[str] = stdout.decode().splitlines()
-        
-        status = []
-        for line in lines:
-            parts: List[str] = line.split()
-            if len(parts) >= 3:
-                name, active_state, sub_state = parts[0], parts[1], parts[2]
-                if name == "klipperfleet.service": continue
-                status.append({
-                    "name": name,
-                    "active": active_state == "active",
-                    "status": sub_state
-                })
-        return status
+        return [
+            {"name": name, "active": active_state == "active", "status": sub_state}
+            for name, active_state, sub_state in await _list_klipper_units()
+        ]
     except Exception:
         return []
 
 @app.get("/services/status")
-async def services_status():
+async def services_status() -> List[Dict[str, Any]]:
     return await get_services_status()
 
 @app.post("/services/manage")
@@ -479,12 +788,43 @@ async def services_manage(action: str) -> Dict[str, str]:
     return {"message": log}
 
 @app.get("/task/status/{task_id}")
-async def get_task_status(task_id: str):
+async def get_task_status(task_id: str, since: Optional[int] = None) -> Dict[str, Any]:
+    """Returns a task. With ?since=N only log lines after the first N are included;
+    pass the returned log_count as the next cursor."""
     task = task_store.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    if since is not None:
+        return {**task, "logs": task_store.get_logs_since(task_id, since)}
     return task
 
+@app.get("/task/stream/{task_id}")
+async def stream_task_logs(task_id: str) -> StreamingResponse:
+    """Streams a task's logs as Server-Sent Events, so each line is sent once instead of re-polling the full list.
+
+    Each message's data is one JSON-encoded log string and its id is the line's index,
+    so a client can resume with /task/status?since=<id + 1>. A final "done" event
+    carries the task status.
+    """
+    if not task_store.get_task(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    queue = task_store.subscribe(task_id)
+
+    async def generate() -> AsyncGenerator[str, None]:
+        try:
+            while True:
+                entry: Optional[Tuple[int, str]] = await queue.get()
+                if entry is None:
+                    break
+                index, log = entry
+                yield f"id: {index}\ndata: {json.dumps(log)}\n\n"
+            task = task_store.get_task(task_id) or {}
+            yield f"event: done\ndata: {json.dumps(task.get('status', 'completed'))}\n\n"
+        finally:
+            task_store.unsubscribe(task_id, queue)
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.post("/task/cancel/{task_id}")
 async def cancel_task_operation(task_id: str) -> Dict[str, str]:
     task = task_store.get_task(task_id)
@@ -506,7 +846,7 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
         flash_results: Dict[str, str] = {}  # device_name -> "SUCCESS"/"SKIPPED"/"FAILED"
         
         try:
-            devices: List[Dict[str, Any]] = fleet_mgr.get_fleet()
+            devices: List[Dict[str, Any]] = await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.get_fleet)
             
             # 1. Build phase
             if "build" in action:
@@ -519,12 +859,12 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
                     for profile in profiles_to_build:
                         if task_store.is_cancelled(task_id): return
                         task_store.add_log(task_id, f"\n>>> BATCH BUILD: Starting {profile}...\n")
-                        config_path: str = os.path.join(PROFILES_DIR, f"{profile}.config")
+                        config_path: str = profile_config_path(profile)
                         build_success = True
-                        async for log in build_mgr.run_build(config_path):
+                        async for chunk in _coalesce_lines(build_mgr.run_build(config_path)):
                             if task_store.is_cancelled(task_id): return
-                            task_store.add_log(task_id, log)
-                            if "!!! Error" in log or "Build failed" in log:
+                            task_store.add_log(task_id, chunk)
+                            if build_success and _BUILD_FAILED_RE.search(chunk):
                                 build_success = False
                         build_results[profile] = "SUCCESS" if build_success else "FAILED"
                         task_store.add_log(task_id, f">>> BATCH BUILD: Finished {profile}\n")
@@ -563,16 +903,19 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
                 
                 reboot_tasks = []
                 device_statuses = {}
+                # Use cached CAN status if possible; check everything else concurrently
+                other_devs = [d for d in devices if d.get('profile') and d['method'] != 'can']
+                other_statuses: List[str] = await asyncio.gather(*(flash_mgr.check_device_status(d['id'], d['method']) for d in other_devs))
+                probed_statuses: Dict[str, str] = {d['id']: st for d, st in zip(other_devs, other_statuses)}
                 for dev in devices:
                     if task_store.is_cancelled(task_id): return
                     if not dev.get('profile'):
                         continue
                     
-                    # Use cached CAN status if possible
                     if dev['method'] == 'can':
                         status: str = can_status_map.get(dev['id'], 'offline')
                     else:
-                        status: str = await flash_mgr.check_device_status(dev['id'], dev['method'])
+                        status: str = probed_statuses[dev['id']]
                     
                     device_statuses[dev['id']] = status
                     task_store.update_device_status(task_id, dev['id'], status)
@@ -598,11 +941,10 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
                 services_stopped = True
 
                 # Record initial serial devices to avoid misidentifying bridges later
-                initial_serials: List[str] = [d['id'] for d in await flash_mgr.discover_serial_devices(skip_moonraker=True)]
+                initial_serials: Set[str] = {d['id'] for d in await flash_mgr.discover_serial_devices(skip_moonraker=True)}
                 
                 if reboot_tasks:
-                    if task_store.is_cancelled(task_id): return
-                    await asyncio.sleep(2) 
+                    if await task_store.wait_cancelled(task_id, 2): return
                     
                     has_manual_dfu = False
                     for dev_info in reboot_tasks:
@@ -622,72 +964,80 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
                                 if task_store.is_cancelled(task_id): return
                                 task_store.add_log(task_id, log)
                     
+                    # Keyed by the id each device had when the batch started
+                    devices_by_original_id: Dict[str, Dict[str, Any]] = {d['id']: d for d in devices}
+
+                    async def probe_reboot_target(dev_info: Dict[str, Any]) -> str:
+                        # Handle mode switching (Serial -> DFU)
+                        current_method = dev_info['method']
+                        current_id = dev_info['id']
+                        original_id = dev_info['original_id']
+                        
+                        # 1. Check if it switched to DFU mode
+                        resolved_dfu_id: str = await flash_mgr.resolve_dfu_id(current_id, known_dfu_id=dev_info.get('dfu_id'))
+                        if resolved_dfu_id != current_id:
+                            # It's in DFU mode now!
+                            task_store.add_log(task_id, f">>> Device {dev_info['name']} detected in DFU mode: {resolved_dfu_id}\n")
+                                
+                            # Update the main devices list using the original_id
+                            device: Dict[str, Any] = devices_by_original_id[original_id]
+                            device['id'] = resolved_dfu_id
+                            device['method'] = 'dfu'
+                                
+                            # Update dev_info for the rest of this loop and future iterations
+                            dev_info['id'] = resolved_dfu_id
+                            dev_info['method'] = 'dfu'
+                            current_id = resolved_dfu_id
+                            current_method = 'dfu'
+                        
+                        # 2. If still serial, check if the ID changed (e.g. Klipper -> Katapult)
+                        elif current_method == 'serial':
+                            new_id: str = await flash_mgr.resolve_serial_id(current_id)
+                            if new_id != current_id:
+                                task_store.add_log(task_id, f">>> Device {dev_info['name']} serial ID changed: {new_id}\n")
+                                # Update the main devices list using the original_id
+                                devices_by_original_id[original_id]['id'] = new_id
+                                dev_info['id'] = new_id
+                                current_id = new_id
+
+                        status: str = await flash_mgr.check_device_status(
+                            current_id, 
+                            current_method, 
+                            dfu_id=dev_info.get('dfu_id'), 
+                            skip_moonraker=True,
+                            is_bridge=dev_info.get('is_bridge', False),
+                            interface=dev_info.get('interface', 'can0')
+                        )
+                        task_store.update_device_status(task_id, current_id, status)
+                        return status
+
                     wait_time: int = 60 if has_manual_dfu else 30
                     task_store.add_log(task_id, f">>> Waiting for devices to enter flash mode (up to {wait_time}s)...\n")
-                    for i in range(wait_time // 2): 
+                    loop = asyncio.get_event_loop()
+                    wait_start: float = loop.time()
+                    last_ready_count: int = -1
+                    # Devices usually re-enumerate within a few seconds: poll quickly
+                    # at first, then back off to the usual 2s cadence.
+                    poll_delay: float = 0.25
+                    while loop.time() - wait_start < wait_time:
                         if task_store.is_cancelled(task_id): return
-                        await asyncio.sleep(2)
+                        fast_phase: bool = poll_delay < 2
+                        await _wait_usb_change_or_cancel(task_id, poll_delay)
+                        poll_delay = min(poll_delay * 1.5, 2)
 
                         interfaces_in_task = set(d['interface'] for d in reboot_tasks if d['method'] == 'can')
                         
                         # Check if CAN interface is still up
                         for interface in interfaces_in_task:
-                            if not await flash_mgr.is_interface_up(interface):
+                            if not await flash_mgr.is_interface_up(interface, force=True):
                                 # If we are waiting for CAN devices, this is a problem
                                 task_store.add_log(task_id, f"!!! CAN interface ({interface}) is DOWN. A bridge may have rebooted unexpectedly.\n")
                                 task_store.add_log(task_id, f">>> Attempting to bring {interface} back up...\n")
                                 await flash_mgr.ensure_canbus_up(interface)
 
-                        ready_count = 0
-                        for dev_info in reboot_tasks:
-                            # Handle mode switching (Serial -> DFU)
-                            current_method = dev_info['method']
-                            current_id = dev_info['id']
-                            original_id = dev_info['original_id']
-                            
-                            # 1. Check if it switched to DFU mode
-                            resolved_dfu_id: str = await flash_mgr.resolve_dfu_id(current_id, known_dfu_id=dev_info.get('dfu_id'))
-                            if resolved_dfu_id != current_id:
-                                # It's in DFU mode now!
-                                task_store.add_log(task_id, f">>> Device {dev_info['name']} detected in DFU mode: {resolved_dfu_id}\n")
-                                
-                                # Update the main devices list using the original_id
-                                for d in devices:
-                                    if d['id'] == original_id:
-                                        d['id'] = resolved_dfu_id
-                                        d['method'] = 'dfu'
-                                        break
-                                
-                                # Update dev_info for the rest of this loop and future iterations
-                                dev_info['id'] = resolved_dfu_id
-                                dev_info['method'] = 'dfu'
-                                current_id = resolved_dfu_id
-                                current_method = 'dfu'
-                            
-                            # 2. If still serial, check if the ID changed (e.g. Klipper -> Katapult)
-                            elif current_method == 'serial':
-                                new_id: str = await flash_mgr.resolve_serial_id(current_id)
-                                if new_id != current_id:
-                                    task_store.add_log(task_id, f">>> Device {dev_info['name']} serial ID changed: {new_id}\n")
-                                    # Update the main devices list using the original_id
-                                    for d in devices:
-                                        if d['id'] == original_id:
-                                            d['id'] = new_id
-                                            break
-                                    dev_info['id'] = new_id
-                                    current_id = new_id
-
-                            status: str = await flash_mgr.check_device_status(
-                                current_id, 
-                                current_method, 
-                                dfu_id=dev_info.get('dfu_id'), 
-                                skip_moonraker=True,
-                                is_bridge=dev_info.get('is_bridge', False),
-                                interface=dev_info.get('interface', 'can0')
-                            )
-                            task_store.update_device_status(task_id, current_id, status)
-                            if status in ["ready", "dfu"]:
-                                ready_count += 1
+                        # Probe all rebooting devices concurrently; each only touches its own entry
+                        statuses: List[str] = await asyncio.gather(*(probe_reboot_target(d) for d in reboot_tasks))
+                        ready_count = sum(1 for status in statuses if status in ["ready", "dfu"])
                         
                         if ready_count == len(reboot_tasks):
                             # Count how many hardware devices are actually ready to be flashed
@@ -709,27 +1059,27 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
                             
                             task_store.add_log(task_id, msg)
                             break
-                        task_store.add_log(task_id, f">>> {ready_count}/{len(reboot_tasks)} hardware devices ready... (waiting)\n")
+                        if not fast_phase or ready_count != last_ready_count:
+                            task_store.add_log(task_id, f">>> {ready_count}/{len(reboot_tasks)} hardware devices ready... (waiting)\n")
+                        last_ready_count = ready_count
 
                 # 2b. Actual flashing
-                # Sort: Non-bridges first, Bridges last
-                sorted_devices: List[Dict[str, Any]] = sorted(devices, key=lambda x: 1 if x.get('is_bridge') else 0)
-                
-                for dev in sorted_devices:
-                    if task_store.is_cancelled(task_id): return
-                    if not dev.get('profile'):
-                        continue
-                    
-                    # Check status (now bridge-aware)
-                    status: str = await flash_mgr.check_device_status(
-                        dev['id'], 
-                        dev['method'], 
-                        dfu_id=dev.get('dfu_id'), 
-                        skip_moonraker=True,
-                        is_bridge=dev.get('is_bridge', False),
-                        interface=dev.get('interface', 'can0')
-                    )
-                    task_store.update_device_status(task_id, dev['id'], status)
+                async def flash_device(dev: Dict[str, Any], emit: Callable[[str], None]) -> None:
+                    if dev['method'] == 'can' and not dev.get('is_bridge') and task_store.get_device_status(task_id, dev['id']) == "ready":
+                        # The pre-flight/readiness scan already saw it in Katapult and nothing
+                        # reboots it again before flashing, so skip another bus scan.
+                        status: str = "ready"
+                    else:
+                        # Check status (now bridge-aware)
+                        status: str = await flash_mgr.check_device_status(
+                            dev['id'], 
+                            dev['method'], 
+                            dfu_id=dev.get('dfu_id'), 
+                            skip_moonraker=True,
+                            is_bridge=dev.get('is_bridge', False),
+                            interface=dev.get('interface', 'can0')
+                        )
+                        task_store.update_device_status(task_id, dev['id'], status)
                     
                     should_flash = False
                     if "flash-all" in action:
@@ -740,19 +1090,18 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
                     if should_flash:
                         if dev.get('is_bridge') and status == "service":
                             if dev['method'] == 'dfu':
-                                task_store.add_log(task_id, f">>> Rebooting Bridge Host {dev['name']} to DFU mode...\n")
+                                emit(f">>> Rebooting Bridge Host {dev['name']} to DFU mode...\n")
                                 # Resolve the serial ID to trigger the reboot
                                 serial_id: str = await flash_mgr.resolve_serial_id(dev['id'])
                                 async for log in flash_mgr.reboot_to_dfu(serial_id):
                                     if task_store.is_cancelled(task_id): return
-                                    task_store.add_log(task_id, log)
+                                    emit(log)
                                 
-                                task_store.add_log(task_id, ">>> Waiting for bridge to enter DFU mode...\n")
-                                await asyncio.sleep(2)
+                                emit(">>> Waiting for bridge to enter DFU mode...\n")
+                                if await task_store.wait_cancelled(task_id, 2): return
                                 dfu_device: Optional[str] = None
-                                for _ in range(30):
+                                async for _ in _poll_backoff(30, task_id=task_id):
                                     if task_store.is_cancelled(task_id): return
-                                    await asyncio.sleep(1)
                                     current_dfus: List[Dict[str, str]] = await flash_mgr.discover_dfu_devices()
                                     if current_dfus:
                                         # If there's only one, it's ours. If multiple, we'd need better matching, 
@@ -763,65 +1112,50 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
                                 if dfu_device:
                                     dev['id'] = dfu_device
                                     status = "ready"
-                                    task_store.add_log(task_id, f">>> Bridge is now in DFU mode: {dev['id']}\n")
+                                    emit(f">>> Bridge is now in DFU mode: {dev['id']}\n")
                                 else:
-                                    task_store.add_log(task_id, "!!! Bridge did not enter DFU mode. Skipping.\n")
+                                    emit("!!! Bridge did not enter DFU mode. Skipping.\n")
                                     flash_results[dev['name']] = "FAILED (DFU timeout)"
-                                    continue
+                                    return
                             else:
-                                task_store.add_log(task_id, f">>> Rebooting Bridge Host {dev['name']} to Katapult...\n")
+                                emit(f">>> Rebooting Bridge Host {dev['name']} to Katapult...\n")
                                 
                                 # 1. Trigger the reboot
                                 async for log in flash_mgr.reboot_to_katapult(dev['id'], dev['method'], dev.get('interface', 'can0'), is_bridge=True, baudrate=dev.get('baudrate', 250000)):
                                     if task_store.is_cancelled(task_id): return
-                                    task_store.add_log(task_id, log)
+                                    emit(log)
 
                                 # 2. Wait for it to reappear as a SERIAL device (Katapult mode)
-                                task_store.add_log(task_id, ">>> Waiting for bridge to enter Katapult mode (Serial)...\n")
-                                await asyncio.sleep(2)
+                                emit(">>> Waiting for bridge to enter Katapult mode (Serial)...\n")
+                                if await task_store.wait_cancelled(task_id, 2): return
                                 new_device: Optional[str] = None
-                                for _ in range(30):
+                                async for _ in _poll_backoff(30, task_id=task_id):
                                     if task_store.is_cancelled(task_id): return
-                                    await asyncio.sleep(1)
-                                    current_serials: List[Dict[str, str]] = await flash_mgr.discover_serial_devices(skip_moonraker=True)
-                                    current_ids: List[str] = [d['id'] for d in current_serials]
-                                    
-                                    # Look for a NEW serial device
-                                    for cid in current_ids:
-                                        if cid not in initial_serials:
-                                            new_device = cid
-                                            break
-                                    if new_device: break
-                                    
-                                    # Fallback: look for ANY Katapult device
-                                    for d in current_serials:
-                                        if "katapult" in d['id'].lower() or "canboot" in d['id'].lower():
-                                            new_device = d['id']
-                                            break
+                                    new_device, _ = await _find_bootloader_serial(initial_serials)
                                     if new_device: break
                                 
                                 if new_device:
                                     dev['id'] = new_device
                                     dev['method'] = "serial"
                                     status = "ready"
-                                    task_store.add_log(task_id, f">>> Bridge is now ready: {dev['id']}\n")
+                                    emit(f">>> Bridge is now ready: {dev['id']}\n")
                                 else:
-                                    task_store.add_log(task_id, "!!! Bridge did not enter Katapult mode. Skipping.\n")
+                                    emit("!!! Bridge did not enter Katapult mode. Skipping.\n")
                                     flash_results[dev['name']] = "FAILED (Katapult timeout)"
-                                    continue
+                                    return
 
                         if status not in ["ready", "dfu"] and dev['method'] != "linux":
-                            task_store.add_log(task_id, f"!!! Skipping {dev['name']} ({dev['id']}) - Device is {status}, not ready for flashing.\n")
+                            emit(f"!!! Skipping {dev['name']} ({dev['id']}) - Device is {status}, not ready for flashing.\n")
                             flash_results[dev['name']] = f"SKIPPED ({status})"
-                            continue
+                            return
 
-                        task_store.add_log(task_id, f"\n>>> FLASHING {dev['name']} ({dev['id']}) with {dev['profile']}...\n")
+                        emit(f"\n>>> FLASHING {dev['name']} ({dev['id']}) with {dev['profile']}...\n")
                         firmware_path: str = os.path.join(ARTIFACTS_DIR, f"{dev['profile']}.elf" if dev['method'] == "linux" else f"{dev['profile']}.bin")
                         
-                        if not os.path.exists(firmware_path):
-                            task_store.add_log(task_id, f"!!! Error: Firmware for {dev['profile']} not found. Skipping.\n")
+                        if not await _firmware_exists(firmware_path):
+                            emit(f"!!! Error: Firmware for {dev['profile']} not found. Skipping.\n")
                             flash_results[dev['name']] = "FAILED (no firmware)"
-                            continue
+                            return
                             
                         task_store.update_device_status(task_id, dev['id'], "flashing")
                         try:
@@ -829,66 +1163,102 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
                                 # Resolve ID in case it changed during reboot (e.g. Klipper -> Katapult)
                                 resolved_id: str = await flash_mgr.resolve_serial_id(dev['id'])
                                 if resolved_id != dev['id']:
-                                    task_store.add_log(task_id, f">>> Resolved serial ID: {dev['id']} -> {resolved_id}\n")
+                                    emit(f">>> Resolved serial ID: {dev['id']} -> {resolved_id}\n")
                                 
-                                async for log in flash_mgr.flash_serial(resolved_id, firmware_path, baudrate=dev.get('baudrate', 250000)):
+                                async for log in _coalesce_lines(flash_mgr.flash_serial(resolved_id, firmware_path, baudrate=dev.get('baudrate', 250000))):
                                     if task_store.is_cancelled(task_id): return
-                                    task_store.add_log(task_id, log)
+                                    emit(log)
                             elif dev['method'] == "can":
                                 interface = dev.get('interface', 'can0')
+                                # Cached briefly, so consecutive CAN flashes share one check
                                 if not await flash_mgr.is_interface_up(interface):
                                     raise IOError(f"CAN interface ({interface}) is DOWN. Cannot flash device.")
-                                async for log in flash_mgr.flash_can(dev['id'], firmware_path, interface):
+                                async for log in _coalesce_lines(flash_mgr.flash_can(dev['id'], firmware_path, interface)):
                                     if task_store.is_cancelled(task_id): return
-                                    task_store.add_log(task_id, log)
+                                    emit(log)
                             elif dev['method'] == "dfu":
                                 resolved_id: str = await flash_mgr.resolve_dfu_id(dev['id'], known_dfu_id=dev.get('dfu_id'))
                                 offset: str = get_flash_offset(dev['profile'])
-                                async for log in flash_mgr.flash_dfu(resolved_id, firmware_path, address=offset, leave=dev.get('use_dfu_exit', True)):
+                                async for log in _coalesce_lines(flash_mgr.flash_dfu(resolved_id, firmware_path, address=offset, leave=dev.get('use_dfu_exit', True))):
                                     if task_store.is_cancelled(task_id): return
-                                    task_store.add_log(task_id, log)
+                                    emit(log)
                             elif dev['method'] == "linux":
-                                async for log in flash_mgr.flash_linux(firmware_path):
+                                async for log in _coalesce_lines(flash_mgr.flash_linux(firmware_path)):
                                     if task_store.is_cancelled(task_id): return
-                                    task_store.add_log(task_id, log)
+                                    emit(log)
                             
                             task_store.update_device_status(task_id, dev['id'], "ready")
                             flash_results[dev['name']] = "SUCCESS"
                         except Exception as e:
-                            task_store.add_log(task_id, f"!!! Error flashing {dev['name']}: {str(e)}\n")
+                            emit(f"!!! Error flashing {dev['name']}: {str(e)}\n")
                             task_store.update_device_status(task_id, dev['id'], "failed")
                             flash_results[dev['name']] = "FAILED"
                     else:
-                        task_store.add_log(task_id, f">>> Skipping {dev['name']} (Status: {status})\n")
+                        emit(f">>> Skipping {dev['name']} (Status: {status})\n")
                         flash_results[dev['name']] = "SKIPPED"
-                
+
+                def log_direct(line: str) -> None:
+                    task_store.add_log(task_id, line)
+
+                flash_slots: asyncio.Semaphore = asyncio.Semaphore(BATCH_FLASH_WORKERS)
+
+                async def flash_prefixed(dev: Dict[str, Any]) -> None:
+                    # Parallel flashes log live, one line per entry, tagged with the device
+                    # name so interleaved output stays readable
+                    prefix: str = f"[{dev['name']}] "
+                    partial: str = ""
+
+                    def log_prefixed(text: str) -> None:
+                        nonlocal partial
+                        *lines, partial = (partial + text).split("\n")
+                        for line in lines:
+                            task_store.add_log(task_id, f"{prefix}{line}\n" if line else "\n")
+
+                    async with flash_slots:
+                        if task_store.is_cancelled(task_id): return
+                        try:
+                            await flash_device(dev, log_prefixed)
+                        except Exception as e:
+                            log_prefixed(f"!!! Error flashing {dev['name']}: {str(e)}\n")
+                            flash_results[dev['name']] = "FAILED"
+                    if partial:
+                        log_prefixed("\n")
+
+                # Non-bridge devices don't share a bus with each other (CAN and DFU flashes
+                # still serialize on their own locks), so flash them a few at a time.
+                # Bridges go last, one by one, since flashing one takes down its CAN bus.
+                to_flash: List[Dict[str, Any]] = [d for d in devices if d.get('profile')]
+                parallel_devices: List[Dict[str, Any]] = [d for d in to_flash if not d.get('is_bridge')]
+                sequential_devices: List[Dict[str, Any]] = [d for d in to_flash if d.get('is_bridge')]
+
+                if len(parallel_devices) > 1:
+                    task_store.add_log(task_id, f">>> Flashing {len(parallel_devices)} devices, up to {BATCH_FLASH_WORKERS} at a time...\n")
+                    await asyncio.gather(*(flash_prefixed(d) for d in parallel_devices))
+                else:
+                    sequential_devices = parallel_devices + sequential_devices
+
+                for dev in sequential_devices:
+                    if task_store.is_cancelled(task_id): return
+                    await flash_device(dev, log_direct)
+                if task_store.is_cancelled(task_id): return
+
                 task_store.add_log(task_id, "\n>>> BATCH FLASH COMPLETED <<<\n")
             
             # Generate summary
-            task_store.add_log(task_id, "\n")
-            task_store.add_log(task_id, "======================== [SUMMARY] ========================\n")
+            summary: List[str] = ["\n", "======================== [SUMMARY] ========================\n"]
             
             # Build summary
             if build_results:
-                task_store.add_log(task_id, "\n  BUILD RESULTS:\n")
-                for profile, result in build_results.items():
-                    if result == "SUCCESS":
-                        task_store.add_log(task_id, f"  [COLOR:GREEN]  - {profile}: {result}[/COLOR]\n")
-                    else:
-                        task_store.add_log(task_id, f"  [COLOR:RED]  - {profile}: {result}[/COLOR]\n")
+                summary.append("\n  BUILD RESULTS:\n")
+                summary.extend(f"  [COLOR:{_summary_color(result)}]  - {profile}: {result}[/COLOR]\n" for profile, result in build_results.items())
             
             # Flash summary
             if flash_results:
-                task_store.add_log(task_id, "\n  FLASH RESULTS:\n")
-                for device_name, result in flash_results.items():
-                    if result == "SUCCESS":
-                        task_store.add_log(task_id, f"  [COLOR:GREEN]  - {device_name}: {result}[/COLOR]\n")
-                    elif result.startswith("SKIPPED") or result == "EXCLUDED":
-                        task_store.add_log(task_id, f"  [COLOR:YELLOW]  - {device_name}: {result}[/COLOR]\n")
-                    else:
-                        task_store.add_log(task_id, f"  [COLOR:RED]  - {device_name}: {result}[/COLOR]\n")
+                summary.append("\n  FLASH RESULTS:\n")
+                summary.extend(f"  [COLOR:{_summary_color(result)}]  - {device_name}: {result}[/COLOR]\n" for device_name, result in flash_results.items())
             
-            task_store.add_log(task_id, "\n===========================================================\n")
+            summary.append("\n===========================================================\n")
+            task_store.add_log(task_id, "".join(summary))
                 
             task_store.add_log(task_id, "\n>>> ALL BATCH OPERATIONS COMPLETED <<<\n")
             
@@ -906,36 +1276,35 @@ async def batch_operation(action: str, background_tasks: BackgroundTasks) -> Dic
 
 @app.get("/download/{profile}")
 async def download_firmware(profile: str) -> FileResponse:
-    """Downloads the klipper.bin for the specified profile."""
-    bin_path: str = os.path.join(ARTIFACTS_DIR, f"{profile}.bin")
-    if not os.path.exists(bin_path):
-        bin_path: str = os.path.join(ARTIFACTS_DIR, f"{profile}.elf")
-        
-    if not os.path.exists(bin_path):
+    """Downloads the klipper.bin for the specified profile.
+
+    FileResponse already sends ETag/Last-Modified and honours Range requests, so
+    interrupted downloads can resume. The stat done here is passed through to it.
+    """
+    for ext in (".bin", ".elf"):
+        bin_path: str = os.path.join(ARTIFACTS_DIR, f"{profile}{ext}")
+        try:
+            stat_result: os.stat_result = await asyncio.get_event_loop().run_in_executor(None, os.stat, bin_path)
+            break
+        except FileNotFoundError:
+            continue
+    else:
         raise HTTPException(status_code=404, detail="Firmware binary not found. Please build first.")
-    
-    ext: str = ".elf" if bin_path.endswith(".elf") else ".bin"
+
     return FileResponse(
         path=bin_path, 
         filename=f"{profile}{ext}",
-        media_type='application/octet-stream'
+        media_type='application/octet-stream',
+        stat_result=stat_result
     )
 
 @app.get("/fleet")
 async def get_fleet(fast: bool = False) -> List[Dict[str, Any]]:
     """Returns the registered fleet of devices with status."""
-    fleet: List[Dict[str, Any]] = fleet_mgr.get_fleet()
+    fleet: List[Dict[str, Any]] = await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.get_fleet)
     
     # Check for active tasks to get real-time status overrides
-    status_overrides = {}
-    is_task_running = False
-    is_bus_task_running = False
-    for tid, task in task_store.tasks.items():
-        if task.get("status") == "running":
-            status_overrides.update(task.get("device_statuses", {}))
-            is_task_running = True
-            if task.get("is_bus_task"):
-                is_bus_task_running = True
+    status_overrides, is_task_running, is_bus_task_running = task_store.running_overview()
 
     # Check if locks are held
     can_locked = flash_mgr._can_lock.locked()
@@ -960,9 +1329,9 @@ async def get_fleet(fast: bool = False) -> List[Dict[str, Any]]:
                     dev['dfu_status'] = 'bus_busy'
                 else:
                     dev['dfu_status'] = 'querying'
-        return fleet
+        return _json_response(fleet)
 
-    for dev in fleet:
+    async def fill_status(dev: Dict[str, Any]) -> None:
         # If we have a real-time override from an active task, use it
         if dev['id'] in status_overrides:
             dev['status'] = status_overrides[dev['id']]
@@ -994,41 +1363,58 @@ async def get_fleet(fast: bool = False) -> List[Dict[str, Any]]:
             # If the DFU device is offline but the parent is in service, mark as inactive
             if dev['dfu_status'] == 'offline' and dev['status'] == 'service':
                 dev['dfu_status'] = 'inactive'
-    return fleet
+
+    # Devices are independent; discovery underneath is cached and single-flighted
+    await asyncio.gather(*(fill_status(dev) for dev in fleet))
+    return _json_response(fleet)
 
 @app.post("/fleet/device")
 async def save_device(device: Device) -> Dict[str, str]:
     """Registers or updates a device in the fleet."""
-    fleet_mgr.save_device(device.dict())
+    await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.save_device, device.model_dump(mode="json"))
     return {"message": "Device saved to fleet"}
 
 @app.post("/fleet/attach")
 async def post_fleet_attach(req: AttachRequest) -> Dict[str, str]:
     """Attaches a discovered hardware ID to an existing fleet entry."""
-    fleet: List[Dict[str, Any]] = fleet_mgr.get_fleet()
-    for dev in fleet:
-        if dev['id'] == req.fleet_id:
-            if req.method == 'dfu':
-                dev['dfu_id'] = req.hardware_id
-            elif req.method == 'serial':
-                # If we are attaching a serial device to a fleet entry, 
-                # we update the primary ID to the serial path.
-                dev['id'] = req.hardware_id
-            fleet_mgr.save_device(dev)
-            return {"message": "Device attached"}
-    raise HTTPException(status_code=404, detail="Fleet device not found")
+    dev: Optional[Dict[str, Any]] = await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.get_device, req.fleet_id)
+    if dev is None:
+        raise HTTPException(status_code=404, detail="Fleet device not found")
+    if req.method == 'dfu':
+        dev['dfu_id'] = req.hardware_id
+    elif req.method == 'serial':
+        # If we are attaching a serial device to a fleet entry, 
+        # we update the primary ID to the serial path.
+        dev['id'] = req.hardware_id
+    await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.save_device, dev)
+    return {"message": "Device attached"}
 
 @app.delete("/fleet/device")
 async def remove_device(device_id: str) -> Dict[str, str]:
     """Removes a device from the fleet."""
-    fleet_mgr.remove_device(device_id)
+    await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.remove_device, device_id)
     return {"message": "Device removed from fleet"}
 
 @app.get("/fleet/versions")
 async def get_fleet_versions() -> Dict[str, Any]:
     """Gets live version information for all fleet devices that are in service."""
-    fleet = fleet_mgr.get_fleet()
-    mcu_versions = await flash_mgr.get_mcu_versions()
+    fleet, mcu_versions = await asyncio.gather(
+        asyncio.get_event_loop().run_in_executor(None, fleet_mgr.get_fleet),
+        flash_mgr.get_mcu_versions()
+    )
+    
+    # Index the MCUs once instead of rescanning them for every device (first match wins)
+    by_identifier: Dict[str, Dict[str, Any]] = {}
+    for mcu_info in mcu_versions.values():
+        identifier = mcu_info.get("identifier")
+        if identifier:
+            by_identifier.setdefault(identifier, mcu_info)
+    # Linux MCU - look for "mcu rpi" or any MCU with MCU="linux"
+    linux_mcu: Optional[Dict[str, Any]] = next(
+        (mcu_info for mcu_id, mcu_info in mcu_versions.items()
+         if mcu_info.get("mcu_constants", {}).get("MCU") == "linux" or "rpi" in mcu_id.lower() or "host" in mcu_id.lower()),
+        None
+    )
     
     version_info: Dict[str, Any] = {}
     for dev in fleet:
@@ -1040,49 +1426,37 @@ async def get_fleet_versions() -> Dict[str, Any]:
             "live_version": None
         }
         
-        # Try to find live version by device ID or check all MCU identifiers
-        if device_id in mcu_versions:
-            dev_info["live_version"] = mcu_versions[device_id].get("version")
-        else:
-            # Try to match by looking at all MCU identifiers
-            for mcu_id, mcu_info in mcu_versions.items():
-                if mcu_info.get("identifier") == device_id:
-                    dev_info["live_version"] = mcu_info.get("version")
-                    break
+        # Try to find live version by device ID, then by MCU identifier
+        mcu_info = mcu_versions[device_id] if device_id in mcu_versions else by_identifier.get(device_id)
+        if mcu_info is not None:
+            dev_info["live_version"] = mcu_info.get("version")
         
-        # Special handling for Linux MCU - look for "mcu rpi" or any MCU with MCU="linux"
-        if dev.get('method') == 'linux' and dev_info["live_version"] is None:
-            for mcu_id, mcu_info in mcu_versions.items():
-                mcu_constants = mcu_info.get("mcu_constants", {})
-                if mcu_constants.get("MCU") == "linux" or "rpi" in mcu_id.lower() or "host" in mcu_id.lower():
-                    dev_info["live_version"] = mcu_info.get("version")
-                    break
+        # Special handling for Linux MCU
+        if dev.get('method') == 'linux' and dev_info["live_version"] is None and linux_mcu is not None:
+            dev_info["live_version"] = linux_mcu.get("version")
         
         version_info[device_id] = dev_info
     
-    return version_info
+    return _json_response(version_info)
 
 @app.get("/devices/discover")
 async def discover_devices() -> Dict[str, List[Dict[str, Any]]]:
     """Discovers Serial, CAN, DFU, and Linux process devices."""
-    serial_devs: List[Dict[str, Any]] = await flash_mgr.discover_serial_devices()
-    can_devs: List[Dict[str, Any]] = await flash_mgr.discover_can_devices(force=True)
-    dfu_devs: List[Dict[str, Any]] = await flash_mgr.discover_dfu_devices()
+    # Independent scans (udev/sysfs, CAN bus, dfu-util), so run them concurrently
+    serial_devs, can_devs, dfu_devs = await asyncio.gather(
+        flash_mgr.discover_serial_devices(),
+        flash_mgr.discover_can_devices(force=True),
+        flash_mgr.discover_dfu_devices()
+    )
     linux_devs: List[Dict[str, Any]] = flash_mgr.discover_linux_process()
     
     # Mark managed devices
-    fleet = fleet_mgr.get_fleet()
-    managed_ids = set()
-    for d in fleet:
-        managed_ids.add(d['id'])
-        if d.get('dfu_id'):
-            managed_ids.add(d['dfu_id'])
-            
+    managed_ids: Set[str] = await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.get_managed_ids)
     for category in [serial_devs, can_devs, dfu_devs, linux_devs]:
         for dev in category:
             dev['managed'] = dev['id'] in managed_ids
 
-    return {"serial": serial_devs, "can": can_devs, "dfu": dfu_devs, "linux": linux_devs}
+    return _json_response({"serial": serial_devs, "can": can_devs, "dfu": dfu_devs, "linux": linux_devs})
 
 @app.post("/flash")
 async def flash_device(req: FlashRequest) -> StreamingResponse:
@@ -1105,7 +1479,7 @@ async def flash_device(req: FlashRequest) -> StreamingResponse:
     else:
         firmware_path: str = os.path.join(ARTIFACTS_DIR, f"{req.profile}.bin")
 
-    if not os.path.exists(firmware_path):
+    if not await _firmware_exists(firmware_path):
         raise HTTPException(status_code=400, detail=f"Firmware for profile '{req.profile}' not found. Please build first.")
     
     async def generate() -> AsyncGenerator[str, None]:
@@ -1121,18 +1495,16 @@ async def flash_device(req: FlashRequest) -> StreamingResponse:
             interface = "can0"
             baudrate = req.baudrate if req.baudrate else 250000
             try:
-                fleet = fleet_mgr.get_fleet()
-                for d in fleet:
-                    if d.get("id") == req.device_id:
-                        interface = d.get("interface", interface)
-                        baudrate = d.get("baudrate", baudrate)
-                        break
+                d: Optional[Dict[str, Any]] = await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.get_device, req.device_id)
+                if d is not None:
+                    interface = d.get("interface", interface)
+                    baudrate = d.get("baudrate", baudrate)
             except Exception:
                 logger.warning("Failed to read fleet for device %s, using defaults (interface=%s, baudrate=%s)",
                                req.device_id, interface, baudrate, exc_info=True)
 
             # Snapshot current serial devices BEFORE reboot (for diff-based detection)
-            initial_serials: List[str] = [d['id'] for d in await flash_mgr.discover_serial_devices(skip_moonraker=True)]
+            initial_serials: Set[str] = {d['id'] for d in await flash_mgr.discover_serial_devices(skip_moonraker=True)}
             new_serial_device: Optional[str] = None
 
             # 1. Check current status
@@ -1152,9 +1524,8 @@ async def flash_device(req: FlashRequest) -> StreamingResponse:
                         yield ">>> Waiting for DFU device to appear...\n"
                         # Wait up to 60 seconds for manual entry
                         found = False
-                        for _ in range(30):
+                        async for _ in _poll_backoff(60, longest=2, task_id=task_id):
                             if task_store.is_cancelled(task_id): return
-                            await asyncio.sleep(2)
                             resolved_dfu_id: str = await flash_mgr.resolve_dfu_id(req.device_id, known_dfu_id=req.dfu_id)
                             dfu_devs: List[Dict[str, str]] = await flash_mgr.discover_dfu_devices()
                             if any(d['id'] == resolved_dfu_id for d in dfu_devs):
@@ -1171,41 +1542,33 @@ async def flash_device(req: FlashRequest) -> StreamingResponse:
                         yield log
                 
                 yield ">>> Waiting for device to enter bootloader mode...\n"
-                await asyncio.sleep(2) # Initial wait for USB bus to settle
+                if await task_store.wait_cancelled(task_id, 2): return # Initial wait for USB bus to settle
                 
                 # Active wait for bootloader (up to 30s) - check both DFU and new serial devices
-                for _ in range(30):
+                async for _ in _poll_backoff(30, task_id=task_id):
                     if task_store.is_cancelled(task_id): return
-                    await asyncio.sleep(1)
                     
+                    # Scan for DFU devices and (for serial) a NEW serial device (Katapult mode,
+                    # snapshot diff) concurrently; a DFU match still takes precedence.
+                    scans: List[Awaitable[Any]] = [flash_mgr.discover_dfu_devices()]
+                    if req.method == "serial":
+                        scans.append(_find_bootloader_serial(initial_serials))
+                    results: List[Any] = await asyncio.gather(*scans)
+
                     # Check if DFU device appeared
-                    dfu_devs = await flash_mgr.discover_dfu_devices()
+                    dfu_devs = results[0]
                     resolved = await flash_mgr.resolve_dfu_id(req.device_id, known_dfu_id=req.dfu_id)
                     if any(d['id'] == resolved for d in dfu_devs):
                         await asyncio.sleep(1)
                         break
                     
-                    # Check for NEW serial device (Katapult mode) using snapshot diff
                     if req.method == "serial":
-                        current_serials: List[Dict[str, str]] = await flash_mgr.discover_serial_devices(skip_moonraker=True)
-                        current_ids: List[str] = [d['id'] for d in current_serials]
-                        
-                        # Look for a NEW serial device that wasn't there before
-                        for cid in current_ids:
-                            if cid not in initial_serials:
-                                new_serial_device = cid
-                                yield f">>> New serial device detected: {cid}\n"
-                                break
-                        if new_serial_device:
-                            break
-                        
-                        # Fallback: look for ANY Katapult/CanBoot device
-                        for d in current_serials:
-                            if "katapult" in d['id'].lower() or "canboot" in d['id'].lower():
-                                new_serial_device = d['id']
-                                yield f">>> Katapult device detected: {d['id']}\n"
-                                break
+                        new_serial_device, is_new = results[1]
                         if new_serial_device:
+                            if is_new:
+                                yield f">>> New serial device detected: {new_serial_device}\n"
+                            else:
+                                yield f">>> Katapult device detected: {new_serial_device}\n"
                             break
 
             if task_store.is_cancelled(task_id): return
@@ -1239,7 +1602,7 @@ async def flash_device(req: FlashRequest) -> StreamingResponse:
                 else:
                     # Fallback to resolve_serial_id for cases where device ID didn't change
                     resolved_serial_id: str = await flash_mgr.resolve_serial_id(req.device_id)
-                    if os.path.exists(resolved_serial_id):
+                    if await _aexists(resolved_serial_id):
                         target_id: str = resolved_serial_id
                         actual_method = "serial"
                         if target_id != req.device_id:
@@ -1273,7 +1636,7 @@ async def flash_device(req: FlashRequest) -> StreamingResponse:
                 # Update version info in fleet after successful flash
                 build_info = build_mgr.get_last_build_info(req.profile)
                 if build_info:
-                    fleet_mgr.update_device_version(req.device_id, build_info)
+                    await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.update_device_version, req.device_id, build_info)
                     yield f">>> Version recorded: {build_info.get('version', 'unknown')} ({build_info.get('commit', 'unknown')})\n"
             except Exception as e:
                 yield f"!!! Error during flash: {str(e)}\n"
@@ -1285,7 +1648,7 @@ async def flash_device(req: FlashRequest) -> StreamingResponse:
                 yield await manage_klipper_services("start")
             task_store.complete_task(task_id)
 
-    return StreamingResponse(generate(), media_type="text/plain", headers={"X-Task-Id": task_id})
+    return StreamingResponse(_coalesce_lines(generate()), media_type="text/plain", headers={"X-Task-Id": task_id})
 
 @app.post("/flash/reboot")
 async def reboot_device(device_id: str, mode: str = "katapult", method: Optional[str] = None) -> StreamingResponse:
@@ -1304,8 +1667,7 @@ async def reboot_device(device_id: str, mode: str = "katapult", method: Optional
     task_store.tasks[task_id]["is_bus_task"] = True
 
     # Find device in fleet to check if it's a bridge
-    fleet: List[Dict[str, Any]] = fleet_mgr.get_fleet()
-    dev: Dict[str, Any] = next((d for d in fleet if d['id'] == device_id), {})
+    dev: Dict[str, Any] = await asyncio.get_event_loop().run_in_executor(None, fleet_mgr.get_device, device_id) or {}
     is_bridge = dev.get('is_bridge', False)
     
     # Use provided method or fall back to fleet entry or default to 'can'
@@ -1318,7 +1680,7 @@ async def reboot_device(device_id: str, mode: str = "katapult", method: Optional
             yield log
         task_store.complete_task(task_id)
 
-    return StreamingResponse(generate(), media_type="text/plain", headers={"X-Task-Id": task_id})
+    return StreamingResponse(_coalesce_lines(generate()), media_type="text/plain", headers={"X-Task-Id": task_id})
 
 @app.post("/debug/test_magic_baud")
 async def test_magic_baud(device_id: str, full_cycle: bool = False) -> StreamingResponse:
@@ -1334,7 +1696,7 @@ async def test_magic_baud(device_id: str, full_cycle: bool = False) -> Streaming
             dfu_devs: List[Dict[str, str]] = await flash_mgr.discover_dfu_devices()
             found_dfu_id = None
             
-            if dfu_devs and not os.path.exists(device_id):
+            if dfu_devs and not await _aexists(device_id):
                 yield ">>> Device is already in DFU mode (or serial port is missing).\n"
                 yield ">>> SUCCESS: DFU device detected.\n"
                 yield ">>> PHASE1_SUCCESS\n"
@@ -1344,18 +1706,16 @@ async def test_magic_baud(device_id: str, full_cycle: bool = False) -> Streaming
             else:
                 # 1. Try the trick
                 try:
-                    import serial
-                    ser = serial.Serial(device_id, 1200)
-                    ser.close()
+                    await flash_mgr.send_magic_baud(device_id)
                     yield ">>> 1200bps signal sent. Waiting 10s for device to reappear in DFU mode...\n"
                 except Exception as e:
                     yield f"!!! Error sending signal: {str(e)}\n"
                     return
 
-                # 2. Wait and check for DFU
-                for i in range(10):
+                # 2. Wait and check for DFU (woken early by USB hotplug events)
+                disconnected = False
+                async for _ in _poll_backoff(10, task_id=task_id):
                     if task_store.is_cancelled(task_id): return
-                    await asyncio.sleep(1)
                     dfu_devs: List[Dict[str, str]] = await flash_mgr.discover_dfu_devices()
                     if dfu_devs:
                         found_dfu_id = dfu_devs[0]['id']
@@ -1363,7 +1723,8 @@ async def test_magic_baud(device_id: str, full_cycle: bool = False) -> Streaming
                         yield ">>> PHASE1_SUCCESS\n"
                         break
                     
-                    if not os.path.exists(device_id):
+                    if not disconnected and not await _aexists(device_id):
+                        disconnected = True
                         yield f">>> Device {device_id} disconnected. Waiting for DFU...\n"
                 
                 if not found_dfu_id:
@@ -1377,10 +1738,11 @@ async def test_magic_baud(device_id: str, full_cycle: bool = False) -> Streaming
                     yield log
                 
                 yield f">>> Waiting 10s for serial device {device_id} to return...\n"
-                for i in range(10):
+                # A path check is a cheap stat (unlike the cached scans), so start polling
+                # at typical re-enumeration latency and back off to 0.5s.
+                async for _ in _poll_backoff(10, first=0.05, longest=0.5, task_id=task_id):
                     if task_store.is_cancelled(task_id): return
-                    await asyncio.sleep(1)
-                    if os.path.exists(device_id):
+                    if await _aexists(device_id):
                         yield f">>> SUCCESS: Device {device_id} is back online!\n"
                         yield ">>> PHASE2_SUCCESS\n"
                         yield ">>> FULL CYCLE SUCCESSFUL.\n"
@@ -1390,38 +1752,50 @@ async def test_magic_baud(device_id: str, full_cycle: bool = False) -> Streaming
         finally:
             task_store.complete_task(task_id)
             
-    return StreamingResponse(generate(), media_type="text/plain", headers={"X-Task-Id": task_id})
+    return StreamingResponse(_coalesce_lines(generate()), media_type="text/plain", headers={"X-Task-Id": task_id})
+
+def _run_update(script: str) -> None:
+    """Starts update.sh detached, so it survives the service restart it triggers."""
+    subprocess.Popen(["bash", script], start_new_session=True)
 
 @app.post("/api/self-update")
 async def self_update(background_tasks: BackgroundTasks) -> Dict[str, str]:
     """Runs the update.sh script in the background."""
-    update_script: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "update.sh")
-    if not os.path.exists(update_script):
+    if not os.path.exists(UPDATE_SCRIPT):
         raise HTTPException(status_code=404, detail="Update script not found")
     
     try:
-        repo_dir = os.path.dirname(os.path.dirname(__file__))
-        fetch_proc = await asyncio.create_subprocess_exec("git", "fetch", "origin", cwd=repo_dir, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        fetch_proc = await asyncio.create_subprocess_exec("git", "fetch", "origin", cwd=REPO_DIR, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
         await fetch_proc.wait()
-        reset_proc = await asyncio.create_subprocess_exec("git", "reset", "--hard", "origin/main", cwd=repo_dir, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        reset_proc = await asyncio.create_subprocess_exec("git", "reset", "--hard", "origin/main", cwd=REPO_DIR, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
         await reset_proc.wait()
     except Exception:
         logger.exception("Git fetch/reset failed during self-update, proceeding with update.sh anyway")
 
-    def run_update() -> None:
-        subprocess.Popen(["bash", update_script], start_new_session=True)
-
-    background_tasks.add_task(run_update)
+    background_tasks.add_task(_run_update, UPDATE_SCRIPT)
     return {"message": "Update started. The service will restart shortly."}
 
-REPO_UI_DIR: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "ui")
+REPO_UI_DIR: str = os.path.join(REPO_DIR, "ui")
 DATA_UI_DIR: str = os.path.join(DATA_DIR, "ui")
 
+class UIStaticFiles(StaticFiles):
+    """StaticFiles that asks browsers to revalidate the UI on each load.
+
+    StaticFiles already sends ETag/Last-Modified and answers If-None-Match with
+    304, so reloads cost a header exchange instead of re-sending index.html,
+    while a KlipperFleet update is still picked up immediately.
+    """
+    def file_response(self, full_path: Any, stat_result: os.stat_result, scope: Any, status_code: int = 200) -> Response:
+        response: Response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
 if os.path.exists(REPO_UI_DIR):
-    app.mount("/", StaticFiles(directory=REPO_UI_DIR, html=True), name="ui")
+    app.mount("/", UIStaticFiles(directory=REPO_UI_DIR, html=True), name="ui")
 elif os.path.exists(DATA_UI_DIR):
-    app.mount("/", StaticFiles(directory=DATA_UI_DIR, html=True), name="ui")
+    app.mount("/", UIStaticFiles(directory=DATA_UI_DIR, html=True), name="ui")
 
 if __name__ == "__main__":
     import uvicorn
+    # uvicorn's default loop picks uvloop when it is installed and falls back to asyncio otherwise
     uvicorn.run(app, host="0.0.0.0", port=8321)
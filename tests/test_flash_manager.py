@@ -1,8 +1,12 @@
 import pytest
 import asyncio
+import os
+import socket
 from unittest.mock import AsyncMock, MagicMock, patch
 from typing import List, Dict
 
+from backend.flash_manager import diff_device_ids, is_bootloader_id
+
 # Test for Issue #4: Failure to resolve new Katapult ID
 # https://github.com/JohnBaumb/KlipperFleet/issues/4
 #
@@ -32,11 +36,11 @@ class TestKatapultIdResolution:
     def test_snapshot_diff_detects_new_device(self):
         """Test that comparing before/after device lists correctly identifies new devices."""
         # Before reboot - device is in Klipper firmware mode
-        initial_serials = [
+        initial_serials = {
             "/dev/serial/by-id/usb-infimech_tx_stm32f401xc_main_mcu-if00",
             "/dev/serial/by-id/usb-AT_stm32g0b1xx_TN_Pro-if00",
             "/dev/serial/by-id/usb-Beacon_Beacon_RevH_62889AF9515U354UD38202020FF0A1D23-if00"
-        ]
+        }
         
         # After reboot - old device gone, new Katapult device appeared
         current_serials = [
@@ -68,7 +72,7 @@ class TestKatapultIdResolution:
         
         new_serial_device = None
         for d in current_serials:
-            if "katapult" in d['id'].lower() or "canboot" in d['id'].lower():
+            if is_bootloader_id(d['id']):
                 new_serial_device = d['id']
                 break
         
@@ -83,7 +87,7 @@ class TestKatapultIdResolution:
         
         new_serial_device = None
         for d in current_serials:
-            if "katapult" in d['id'].lower() or "canboot" in d['id'].lower():
+            if is_bootloader_id(d['id']):
                 new_serial_device = d['id']
                 break
         
@@ -91,10 +95,10 @@ class TestKatapultIdResolution:
 
     def test_no_false_positive_when_no_new_device(self):
         """Test that we don't incorrectly identify a device when nothing changed."""
-        initial_serials = [
+        initial_serials = {
             "/dev/serial/by-id/usb-AT_stm32g0b1xx_TN_Pro-if00",
             "/dev/serial/by-id/usb-Beacon_Beacon_RevH_62889-if00"
-        ]
+        }
         
         # Same devices after "reboot" (device didn't actually change)
         current_serials = [
@@ -114,9 +118,9 @@ class TestKatapultIdResolution:
 
     def test_diff_ignores_unrelated_new_devices(self):
         """Test that diff approach finds the katapult device, not just any new device."""
-        initial_serials = [
+        initial_serials = {
             "/dev/serial/by-id/usb-infimech_tx_stm32f401xc_main_mcu-if00"
-        ]
+        }
         
         # Two new devices appeared - prefer the katapult one
         current_serials = [
@@ -141,7 +145,7 @@ class TestKatapultIdResolution:
         # But if we need to be more specific, fallback checks for katapult name
         katapult_device = None
         for d in current_serials:
-            if "katapult" in d['id'].lower() or "canboot" in d['id'].lower():
+            if is_bootloader_id(d['id']):
                 katapult_device = d['id']
                 break
         
@@ -199,25 +203,247 @@ class TestIntegrationScenario:
         
         # Take initial snapshot
         initial_devices = await mock_discover_serial()
-        initial_serials = [d['id'] for d in initial_devices]
         
         # Simulate reboot happening...
         
         # Discover again after reboot
         current_devices = await mock_discover_serial()
-        current_ids = [d['id'] for d in current_devices]
         
-        # Find the new device
-        new_serial_device = None
-        for cid in current_ids:
-            if cid not in initial_serials:
-                new_serial_device = cid
-                break
+        # Diff the snapshots, as main.py does
+        added, removed = diff_device_ids(
+            (d['id'] for d in initial_devices), (d['id'] for d in current_devices)
+        )
+        new_serial_device = next(iter(added), None)
         
-        # We should find the new Katapult device
-        assert new_serial_device == "/dev/serial/by-id/usb-katapult_stm32f401xc_1A0028000A51333138373435-if00"
+        # We should find the new Katapult device, and the old Klipper one is gone
+        assert added == ["/dev/serial/by-id/usb-katapult_stm32f401xc_1A0028000A51333138373435-if00"]
+        assert removed == {"/dev/serial/by-id/usb-infimech_tx_stm32f401xc_main_mcu-if00"}
         
         # This new_serial_device would then be used for flashing
         target_id = new_serial_device
         assert target_id is not None
         assert "katapult" in target_id.lower()
+
+
+class TestCrc16:
+    """Katapult packets are framed with CRC-16/MCRF4XX (reflected CCITT, init 0xFFFF)."""
+
+    def test_matches_check_value(self):
+        from backend.flash_manager import crc16_ccitt
+        assert crc16_ccitt(b"123456789") == 0x6F91
+        assert crc16_ccitt(b"") == 0xFFFF
+
+    def test_complete_packet_framing(self):
+        from backend.flash_manager import build_katapult_packet
+        assert build_katapult_packet(b"\x15\x00") == bytes.fromhex("01881500911b9903")
+
+
+class TestMoonrakerNegativeCache:
+    """An unreachable Moonraker is only probed once per back-off window."""
+
+    @pytest.mark.asyncio
+    async def test_connect_error_short_circuits_next_query(self):
+        import httpx
+        from backend.flash_manager import FlashManager
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+        client = MagicMock()
+        client.__aenter__ = AsyncMock(return_value=client)
+        client.__aexit__ = AsyncMock(return_value=False)
+        client.get = AsyncMock(side_effect=httpx.ConnectError("refused"))
+
+        with patch("backend.flash_manager.httpx.AsyncClient", return_value=client):
+            assert await mgr._get_moonraker_mcus() == {}
+            assert await mgr._get_moonraker_mcus() == {}
+
+        assert client.get.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_request(self):
+        from backend.flash_manager import FlashManager
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+        calls = 0
+
+        async def fake_query():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"aabbccddeeff": {"name": "mcu toolhead", "active": True, "stats": {}}}
+
+        mgr._query_moonraker_mcus = fake_query
+        first, second = await asyncio.gather(mgr._get_moonraker_mcus(), mgr._get_moonraker_mcus())
+
+        assert calls == 1
+        assert first == second
+        assert first is not second
+
+    @pytest.mark.asyncio
+    async def test_repeated_queries_reuse_recent_result(self):
+        from backend.flash_manager import FlashManager
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+        calls = 0
+
+        async def fake_query():
+            nonlocal calls
+            calls += 1
+            return {"aabbccddeeff": {"name": "mcu toolhead", "active": True, "stats": {}}}
+
+        mgr._query_moonraker_mcus = fake_query
+        await mgr._get_moonraker_mcus()
+        await mgr._get_moonraker_mcus()
+        assert calls == 1
+
+        mgr._moonraker_mcus_ttl_s = 0.0
+        await mgr._get_moonraker_mcus()
+        assert calls == 2
+
+
+class TestUsbHotplugWait:
+    """Bootloader waits wake early on USB/tty hotplug and see fresh scans."""
+
+    @pytest.mark.asyncio
+    async def test_hotplug_wakes_waiter_and_drops_cached_scans(self):
+        from backend.flash_manager import FlashManager
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+        mgr._udev_observer = MagicMock()  # as if the monitor were running
+        mgr._serial_cache[True] = (asyncio.get_event_loop().time(), [{"id": "/dev/ttyACM0"}])
+        mgr._dfu_cache_time = asyncio.get_event_loop().time()
+
+        asyncio.get_event_loop().call_later(0.01, mgr._on_usb_change)
+        start = asyncio.get_event_loop().time()
+        await mgr.wait_for_usb_change(5)
+
+        assert asyncio.get_event_loop().time() - start < 1
+        assert mgr._serial_cache == {}
+        assert mgr._dfu_cache_time == 0.0
+
+    @pytest.mark.asyncio
+    async def test_without_udev_monitor_waits_full_timeout(self):
+        from backend.flash_manager import FlashManager
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+        with patch("backend.flash_manager.pyudev", None), \
+                patch("backend.flash_manager._open_uevent_socket", side_effect=OSError("no netlink")):
+            start = asyncio.get_event_loop().time()
+            await mgr.wait_for_usb_change(0.05)
+        assert asyncio.get_event_loop().time() - start >= 0.05
+        assert mgr._udev_observer is False
+
+    def test_netlink_fallback_filters_subsystems(self):
+        import struct
+        from backend.flash_manager import FlashManager, _uevent_subsystem
+
+        # Raw kernel format and udev's libudev-header format
+        kernel_msg = b"add@/devices/usb1/1-1\0ACTION=add\0SUBSYSTEM=usb\0"
+        props = b"ACTION=add\0SUBSYSTEM=tty\0DEVNAME=/dev/ttyACM0\0"
+        udev_msg = b"libudev\0" + struct.pack("=IIII", 0xfeedcafe, 40, 40, len(props)) + bytes(16) + props
+        assert _uevent_subsystem(kernel_msg) == b"usb"
+        assert _uevent_subsystem(udev_msg) == b"tty"
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+        reader, writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        reader.setblocking(False)
+        try:
+            writer.send(b"change@/devices/net/can0\0SUBSYSTEM=net\0")
+            mgr._on_uevent(reader)
+            assert not mgr._usb_changed.is_set()
+
+            writer.send(udev_msg)
+            mgr._on_uevent(reader)
+            assert mgr._usb_changed.is_set()
+        finally:
+            reader.close()
+            writer.close()
+
+
+class TestMagicBaud:
+    """The 1200bps trick only needs the port reconfigured to 1200 baud and closed."""
+
+    @pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs a pseudo-terminal")
+    def test_sets_1200_baud_on_tty(self):
+        import termios
+        from backend.flash_manager import _send_magic_baud
+
+        master, slave = os.openpty()
+        try:
+            _send_magic_baud(os.ttyname(slave))
+            attrs = termios.tcgetattr(slave)
+            assert attrs[4] == attrs[5] == termios.B1200
+            assert attrs[2] & termios.HUPCL
+        finally:
+            os.close(slave)
+            os.close(master)
+
+
+class TestFlashCommandCancellation:
+    """Abandoning a flash command's output stops the flasher process."""
+
+    @pytest.mark.asyncio
+    async def test_closing_generator_terminates_process(self):
+        from backend.flash_manager import FlashManager
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+        gen = mgr._run_flash_command(["sh", "-c", "echo $$; exec sleep 30"])
+        pid = int(await gen.__anext__())
+        await gen.aclose()
+
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
+
+
+class TestDfuDiscovery:
+    """dfu-util -l lines are parsed into one entry per device (alt settings collapsed)."""
+
+    @pytest.mark.asyncio
+    async def test_parses_and_deduplicates_alt_settings(self):
+        from backend.flash_manager import FlashManager
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+        output = (
+            b"dfu-util 0.11\n\n"
+            b'Found DFU: [0483:df11] ver=0200, devnum=12, cfg=1, intf=0, path="1-1.2", alt=1, name="@Option Bytes  /0x1FFFC000/01*016 e", serial="357236543131"\n'
+            b'Found DFU: [0483:df11] ver=0200, devnum=12, cfg=1, intf=0, path="1-1.2", alt=0, name="@Internal Flash  /0x08000000/064*0002Kg", serial="357236543131"\n'
+            b'Found DFU: [0483:df11] ver=0200, devnum=13, cfg=1, intf=0, path="1-1.3", alt=0, name="@Internal Flash  /0x08000000/064*0002Kg", serial="UNKNOWN"\n'
+        )
+        with patch.object(mgr, "_run_probe", AsyncMock(return_value=output)):
+            devices = await mgr.discover_dfu_devices()
+
+        assert [d["id"] for d in devices] == ["357236543131", "1-1.3"]
+        assert devices[0]["vid_pid"] == "0483:df11"
+        assert devices[0]["path"] == "1-1.2"
+        assert devices[0]["name"] == "DFU Device (0483:df11) S/N: 357236543131"
+        assert devices[1]["serial"] == "UNKNOWN"
+
+    @pytest.mark.asyncio
+    async def test_scan_trusted_until_hotplug_while_monitor_runs(self):
+        from backend.flash_manager import FlashManager
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+        mgr._udev_observer = MagicMock()  # as if the monitor were running
+        probe = AsyncMock(return_value=b"")
+        with patch.object(mgr, "_run_probe", probe):
+            await mgr.discover_dfu_devices()
+            mgr._dfu_cache_time -= mgr._dfu_cache_ttl_s + 1  # past the polling TTL
+            await mgr.discover_dfu_devices()
+            assert probe.await_count == 1
+
+            mgr._on_usb_change()
+            await mgr.discover_dfu_devices()
+            assert probe.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_scan_racing_hotplug_is_not_cached(self):
+        from backend.flash_manager import FlashManager
+
+        mgr = FlashManager("/tmp/klipper", "/tmp/katapult")
+
+        async def probe(*args):
+            mgr._on_usb_change()
+            return b""
+
+        with patch.object(mgr, "_run_probe", side_effect=probe):
+            await mgr.discover_dfu_devices()
+        assert mgr._dfu_cache_time == 0.0
@@ -45,6 +45,54 @@ def test_update_device_id(fleet_mgr):
     assert fleet[0]["id"] == "new_id"
     assert "old_id" not in fleet[0]
 
+def test_get_device(fleet_mgr):
+    fleet_mgr.save_device({"id": "a", "name": "A"})
+    fleet_mgr.save_device({"id": "b", "name": "B"})
+
+    assert fleet_mgr.get_device("b")["name"] == "B"
+    assert fleet_mgr.get_device("missing") is None
+
+    # Copies are handed out, and later writes are picked up
+    fleet_mgr.get_device("a")["name"] = "changed"
+    assert fleet_mgr.get_device("a")["name"] == "A"
+    fleet_mgr.save_device({"id": "a", "name": "Renamed"})
+    assert fleet_mgr.get_device("a")["name"] == "Renamed"
+    fleet_mgr.remove_device("b")
+    assert fleet_mgr.get_device("b") is None
+
+def test_get_managed_ids(fleet_mgr):
+    fleet_mgr.save_device({"id": "a", "name": "A", "dfu_id": "dfu-a"})
+    fleet_mgr.save_device({"id": "b", "name": "B"})
+    assert fleet_mgr.get_managed_ids() == {"a", "dfu-a", "b"}
+
+    fleet_mgr.remove_device("a")
+    assert fleet_mgr.get_managed_ids() == {"b"}
+
+def test_get_fleet_returns_copies_and_sees_external_edits(fleet_mgr):
+    fleet_mgr.save_device({"id": "a", "name": "A"})
+    fleet_mgr.get_fleet()[0]["name"] = "changed"
+    assert fleet_mgr.get_fleet()[0]["name"] == "A"
+
+    # A hand edit of fleet.json is picked up on the next read
+    with open(fleet_mgr.fleet_file, 'w') as f:
+        json.dump([{"id": "b", "name": "B"}], f)
+    os.utime(fleet_mgr.fleet_file, ns=(0, 0))
+    assert [d["id"] for d in fleet_mgr.get_fleet()] == ["b"]
+    fleet_mgr.save_device({"id": "c", "name": "C"})
+    assert [d["id"] for d in fleet_mgr.get_fleet()] == ["b", "c"]
+
+def test_get_fleet_sees_replace_with_same_mtime(fleet_mgr):
+    fleet_mgr.save_device({"id": "a", "name": "A"})
+    mtime_ns = os.stat(fleet_mgr.fleet_file).st_mtime_ns
+
+    # An external rewrite within the same timestamp tick (coarse SD card clocks)
+    tmp_path = fleet_mgr.fleet_file + ".edit"
+    with open(tmp_path, 'w') as f:
+        json.dump([{"id": "b", "name": "B"}], f)
+    os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp_path, fleet_mgr.fleet_file)
+    assert [d["id"] for d in fleet_mgr.get_fleet()] == ["b"]
+
 def test_remove_device(fleet_mgr):
     device = {"id": "test_id", "name": "Test Device"}
     fleet_mgr.save_device(device)
@@ -52,3 +100,24 @@ def test_remove_device(fleet_mgr):
     
     fleet_mgr.remove_device("test_id")
     assert len(fleet_mgr.get_fleet()) == 0
+
+@pytest.mark.asyncio
+async def test_refresh_all_live_versions(fleet_mgr):
+    fleet_mgr.save_device({"id": "a", "name": "A"})
+    fleet_mgr.save_device({"id": "b", "name": "B"})
+    fleet_mgr.save_device({"id": "c", "name": "C"})
+
+    async def query(device_id):
+        if device_id == "b":
+            raise RuntimeError("unreachable")
+        if device_id == "c":
+            return None
+        return "v0.12.0"
+
+    updated = await fleet_mgr.refresh_all_live_versions(query)
+    assert updated == {"a": "v0.12.0"}
+
+    fleet = {d["id"]: d for d in fleet_mgr.get_fleet()}
+    assert fleet["a"]["live_version"] == "v0.12.0"
+    assert "live_version" not in fleet["b"]
+    assert "live_version" not in fleet["c"]
@@ -70,3 +70,194 @@ def test_save_config(kconfig_mgr, tmp_path):
     assert out_config.exists()
     content = out_config.read_text()
     assert 'CONFIG_BOARD_MCU="rp2040"' in content
+
+@pytest.mark.asyncio
+async def test_load_kconfig_reuses_parse(kconfig_mgr):
+    await kconfig_mgr.load_kconfig()
+    first = kconfig_mgr.kconf
+    kconfig_mgr.set_value("CANBUS_INTERFACE", "y")
+
+    await kconfig_mgr.load_kconfig()
+    assert kconfig_mgr.kconf is first
+    # User values from the previous request must not leak into the next one
+    assert kconfig_mgr.kconf.syms["CANBUS_INTERFACE"].str_value == "n"
+
+    # Touching the Kconfig source forces a re-parse
+    st = os.stat(kconfig_mgr.kconfig_file)
+    os.utime(kconfig_mgr.kconfig_file, (st.st_atime, st.st_mtime + 10))
+    await kconfig_mgr.load_kconfig()
+    assert kconfig_mgr.kconf is not first
+
+def test_get_menu_tree_reuses_unchanged_tree(kconfig_mgr):
+    tree = kconfig_mgr.get_menu_tree()
+    assert kconfig_mgr.get_menu_tree() is tree
+
+    kconfig_mgr.set_value("CANBUS_INTERFACE", "y")
+    updated = kconfig_mgr.get_menu_tree()
+    assert updated is not tree
+
+    def walk(nodes):
+        for n in nodes:
+            yield n
+            yield from walk(n.get('children', []))
+
+    speed = next(n for n in walk(updated) if n.get('name') == 'CANBUS_SPEED')
+    assert speed['visible']
+    assert 'CANBUS_INTERFACE' in speed['dep_str']
+
+def test_apply_values_resolves_dependencies(kconfig_mgr):
+    # CANBUS_SPEED is only visible once CANBUS_INTERFACE is enabled
+    failed = kconfig_mgr.apply_values([("CANBUS_SPEED", "500000"), ("CANBUS_INTERFACE", "y")])
+    assert failed == []
+    assert kconfig_mgr.kconf.syms["CANBUS_INTERFACE"].str_value == "y"
+    assert kconfig_mgr.kconf.syms["CANBUS_SPEED"].str_value == "500000"
+    # Re-applying the same values changes nothing
+    assert not kconfig_mgr.set_value("CANBUS_SPEED", "500000")
+
+def test_iter_menu_tree_matches_nested_tree(kconfig_mgr):
+    def flatten(nodes, depth=0):
+        for n in nodes:
+            yield depth, {k: v for k, v in n.items() if k != 'children'}
+            yield from flatten(n.get('children', []), depth + 1)
+
+    assert list(kconfig_mgr.iter_menu_tree()) == list(flatten(kconfig_mgr.get_menu_tree()))
+
+@pytest.mark.asyncio
+async def test_menu_tree_entries_loads_profile(kconfig_mgr, tmp_path):
+    config_path = tmp_path / "profile.config"
+    config_path.write_text("CONFIG_BOARD_MCU=\"rp2040\"\n")
+
+    entries = await kconfig_mgr.menu_tree_entries(str(config_path))
+    assert entries == list(kconfig_mgr.iter_menu_tree())
+    assert next(item for _, item in entries if item['name'] == 'BOARD_MCU')['value'] == 'rp2040'
+
+@pytest.mark.asyncio
+async def test_load_config_replay_matches_fresh_load(tmp_path):
+    klipper_dir = tmp_path / "klipper_choice"
+    (klipper_dir / "src").mkdir(parents=True)
+    (klipper_dir / "src" / "Kconfig").write_text("""
+mainmenu "Klipper Configuration"
+
+choice
+    prompt "Processor model"
+    config MACH_A
+        bool "A"
+    config MACH_B
+        bool "B"
+endchoice
+
+config HAVE_LIMITED_CODE_SIZE
+    bool "Limited code size"
+
+config BOARD_NAME
+    string "Board name"
+    default "generic"
+""")
+    mgr = KconfigManager(str(klipper_dir))
+    await mgr.load_kconfig()
+    mgr.set_value("MACH_B", "y")
+    mgr.set_value("BOARD_NAME", "octopus")
+    profile = tmp_path / "profile.config"
+    mgr.save_config(str(profile))
+
+    def snapshot():
+        return {name: sym.str_value for name, sym in mgr.kconf.syms.items()}
+
+    await mgr.load_kconfig(str(profile))
+    fresh = snapshot()
+    assert fresh["MACH_B"] == "y" and fresh["BOARD_NAME"] == "octopus"
+
+    mgr.set_value("MACH_A", "y")
+    await mgr.load_kconfig(str(profile))
+    assert snapshot() == fresh
+
+@pytest.mark.asyncio
+async def test_load_after_resave_within_one_tick(kconfig_mgr, tmp_path):
+    profile = tmp_path / "profile.config"
+    await kconfig_mgr.save_values(None, [("BOARD_MCU", "aaa")], str(profile))
+    await kconfig_mgr.load_kconfig(str(profile))
+    mtime_ns = os.stat(profile).st_mtime_ns
+
+    await kconfig_mgr.save_values(None, [("BOARD_MCU", "bbb")], str(profile))
+    os.utime(profile, ns=(mtime_ns, mtime_ns))
+    await kconfig_mgr.load_kconfig(str(profile))
+    assert kconfig_mgr.kconf.syms["BOARD_MCU"].str_value == "bbb"
+
+@pytest.mark.asyncio
+async def test_build_menu_tree_caches_previews(kconfig_mgr, tmp_path):
+    config_path = tmp_path / "profile.config"
+    config_path.write_text("CONFIG_BOARD_MCU=\"rp2040\"\n")
+    values = [("CANBUS_INTERFACE", "y")]
+
+    tree, failed = await kconfig_mgr.build_menu_tree(str(config_path), values)
+    again, _ = await kconfig_mgr.build_menu_tree(str(config_path), values)
+    assert again is tree
+    assert failed == []
+
+    # Different unsaved values, or a re-saved profile, build a new tree
+    other, _ = await kconfig_mgr.build_menu_tree(str(config_path), [])
+    assert other is not tree
+    config_path.write_text("CONFIG_BOARD_MCU=\"stm32\"\n")
+    os.utime(config_path, ns=(0, os.stat(config_path).st_mtime_ns + 1))
+    resaved, _ = await kconfig_mgr.build_menu_tree(str(config_path), values)
+    assert resaved is not tree
+    mcu_node = next(n for n in resaved if n['name'] == 'BOARD_MCU')
+    assert mcu_node['value'] == 'stm32'
+
+@pytest.mark.asyncio
+async def test_save_values_drops_previews_of_saved_profile(kconfig_mgr, tmp_path):
+    profile = tmp_path / "profile.config"
+    await kconfig_mgr.save_values(None, [("BOARD_MCU", "aaa")], str(profile))
+    await kconfig_mgr.build_menu_tree(str(profile), [])
+    mtime_ns = os.stat(profile).st_mtime_ns
+
+    await kconfig_mgr.save_values(None, [("BOARD_MCU", "bbb")], str(profile))
+    os.utime(profile, ns=(mtime_ns, mtime_ns))
+    resaved, _ = await kconfig_mgr.build_menu_tree(str(profile), [])
+    assert next(n for n in resaved if n['name'] == 'BOARD_MCU')['value'] == 'bbb'
+
+@pytest.mark.asyncio
+async def test_build_menu_tree_reparse_drops_previews(kconfig_mgr):
+    tree, _ = await kconfig_mgr.build_menu_tree(None, [])
+    etag = await kconfig_mgr.menu_tree_etag(None)
+
+    kconfig = kconfig_mgr.kconfig_file
+    os.utime(kconfig, ns=(0, os.stat(kconfig).st_mtime_ns + 10**9))
+    reparsed, _ = await kconfig_mgr.build_menu_tree(None, [])
+    assert reparsed is not tree
+    assert await kconfig_mgr.menu_tree_etag(None) != etag
+
+@pytest.mark.asyncio
+async def test_menu_tree_etag_tracks_profile(kconfig_mgr, tmp_path):
+    config_path = tmp_path / "profile.config"
+    config_path.write_text("CONFIG_BOARD_MCU=\"rp2040\"\n")
+
+    etag = await kconfig_mgr.menu_tree_etag(str(config_path))
+    assert await kconfig_mgr.menu_tree_etag(str(config_path)) == etag
+    assert await kconfig_mgr.menu_tree_etag(str(config_path), show_optional=True) != etag
+
+    os.utime(config_path, ns=(0, os.stat(config_path).st_mtime_ns + 1))
+    assert await kconfig_mgr.menu_tree_etag(str(config_path)) != etag
+
+    # A re-save that leaves the file stamp unchanged still changes the ETag
+    etag = await kconfig_mgr.menu_tree_etag(str(config_path))
+    stamp = os.stat(config_path)
+    await kconfig_mgr.save_values(None, [("BOARD_MCU", "stm32")], str(config_path))
+    os.utime(config_path, ns=(stamp.st_atime_ns, stamp.st_mtime_ns))
+    assert await kconfig_mgr.menu_tree_etag(str(config_path)) != etag
+
+def test_can_set_follows_dependencies(kconfig_mgr):
+    assert not kconfig_mgr.can_set("CANBUS_SPEED", "500000")
+    assert not kconfig_mgr.set_value("CANBUS_SPEED", "500000")
+    assert not kconfig_mgr.can_set("CANBUS_INTERFACE", "maybe")
+    assert not kconfig_mgr.can_set("__node_1", "")
+
+    assert kconfig_mgr.set_value("CANBUS_INTERFACE", "y")
+    assert kconfig_mgr.can_set("CANBUS_SPEED", "500000")
+    assert kconfig_mgr.set_value("CANBUS_SPEED", "500000")
+
+def test_can_set_accepts_m_for_bool(kconfig_mgr):
+    # Saved profiles may hold =m for bool options; kconfiglib stores them as y
+    assert kconfig_mgr.can_set("CANBUS_INTERFACE", "m")
+    assert kconfig_mgr.apply_values([("CANBUS_INTERFACE", "m")]) == []
+    assert kconfig_mgr.kconf.syms["CANBUS_INTERFACE"].str_value == "y"